@@ -0,0 +1 @@
+"""Singer tap for Dash Hudson."""
@@ -0,0 +1,162 @@
+"""Archive of raw API responses, for re-parsing history without the API."""
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse, urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+ARCHIVE_MODES = ("capture", "replay")
+
+# Response headers kept with an archived body.
+_ARCHIVED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class ResponseArchive:
+    """Directory of raw response bodies and the requests they answered.
+
+    Bodies are gzipped under `objects/`, named by the SHA-256 of their content,
+    so identical responses are stored once. Each request has an entry under
+    `requests/` holding its URL, query parameters and body digest, keyed by
+    method and URL but not credentials, so an archive can be replayed with any
+    API key.
+
+    In `capture` mode successful responses are archived as they arrive. In
+    `replay` mode streams do not plan requests at all: every archived response
+    to a stream's URL is read back, whatever its query, oldest capture first.
+    """
+
+    def __init__(self, directory: str, mode: str = "capture") -> None:
+        """Initialize the archive."""
+        if mode not in ARCHIVE_MODES:
+            raise ValueError(f"Unknown archive mode '{mode}'.")
+        self.directory = Path(directory)
+        self.mode = mode
+        self._entries: Optional[Dict[str, List[dict]]] = None
+        self._lock = threading.Lock()
+        (self.directory / "objects").mkdir(parents=True, exist_ok=True)
+        (self.directory / "requests").mkdir(parents=True, exist_ok=True)
+
+    @property
+    def replay(self) -> bool:
+        """Return whether responses are read from the archive."""
+        return self.mode == "replay"
+
+    @staticmethod
+    def get_key(request: requests.PreparedRequest) -> str:
+        """Return the archive key of a request."""
+        parts = [request.method or "GET", request.url or ""]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def put(
+        self, request: requests.PreparedRequest, response: requests.Response
+    ) -> requests.Response:
+        """Archive a response, returning it served from the archived body."""
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self._get_object_path(digest)
+        if not object_path.exists():
+            object_path.parent.mkdir(exist_ok=True)
+            _write_atomic(object_path, gzip.compress(content, compresslevel=6))
+        url = request.url or ""
+        entry = {
+            "method": request.method,
+            "url": url,
+            "params": parse_qs(urlparse(url).query),
+            "status": response.status_code,
+            "headers": {
+                name: response.headers[name]
+                for name in _ARCHIVED_HEADERS
+                if name in response.headers
+            },
+            "body": digest,
+            "captured_at": time.time(),
+        }
+        entry_path = self.directory / "requests" / f"{self.get_key(request)}.json"
+        _write_atomic(entry_path, json.dumps(entry).encode())
+        return self._to_response(request, entry, content)
+
+    def get(self, request: requests.PreparedRequest) -> requests.Response:
+        """Return the archived response to a request."""
+        entry_path = self.directory / "requests" / f"{self.get_key(request)}.json"
+        try:
+            entry = json.loads(entry_path.read_text())
+        except FileNotFoundError:
+            raise LookupError(
+                f"No archived response for {request.method} {request.url}."
+            ) from None
+        content = gzip.decompress(self._get_object_path(entry["body"]).read_bytes())
+        return self._to_response(request, entry, content)
+
+    def iter_responses(self, url: str) -> Iterator[requests.Response]:
+        """Yield the archived responses to requests of `url`, oldest capture first.
+
+        Requests are matched on their URL without the query, so every date
+        window and page captured for a stream and brand is included. A request
+        captured more than once, by method, URL and query parameters, is only
+        replayed from its latest capture.
+        """
+        for entry in self._get_entries().get(_strip_query(url), []):
+            request = requests.Request(entry["method"], entry["url"]).prepare()
+            content = gzip.decompress(self._get_object_path(entry["body"]).read_bytes())
+            yield self._to_response(request, entry, content)
+
+    def _get_entries(self) -> Dict[str, List[dict]]:
+        # The latest entry of each request, by URL without query, read once.
+        with self._lock:
+            if self._entries is None:
+                latest: Dict[Tuple[str, str, str], dict] = {}
+                for entry_path in (self.directory / "requests").glob("*.json"):
+                    entry = json.loads(entry_path.read_text())
+                    key = (
+                        entry["method"],
+                        _strip_query(entry["url"]),
+                        json.dumps(entry["params"], sort_keys=True),
+                    )
+                    if key not in latest or (
+                        entry["captured_at"] > latest[key]["captured_at"]
+                    ):
+                        latest[key] = entry
+                entries: Dict[str, List[dict]] = {}
+                for (_, url, _), entry in latest.items():
+                    entries.setdefault(url, []).append(entry)
+                for url_entries in entries.values():
+                    url_entries.sort(key=lambda entry: entry["captured_at"])
+                self._entries = entries
+            return self._entries
+
+    def _get_object_path(self, digest: str) -> Path:
+        return self.directory / "objects" / digest[:2] / f"{digest}.gz"
+
+    @staticmethod
+    def _to_response(
+        request: requests.PreparedRequest, entry: dict, content: bytes
+    ) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = content
+        response.raw = io.BytesIO(content)
+        response.url = request.url or ""
+        response.encoding = "utf-8"
+        response.request = request
+        return response
+
+
+def _strip_query(url: str) -> str:
+    return urlsplit(url)._replace(query="", fragment="").geturl()
+
+
+def _write_atomic(path: Path, content: bytes) -> None:
+    # Unique per writer, as shards and threads may archive the same body.
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
@@ -0,0 +1,223 @@
+"""Asyncio request engine for tap-dash-hudson."""
+
+import asyncio
+import threading
+from collections import deque
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    Deque,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+)
+
+import requests
+from singer_sdk.exceptions import RetriableAPIError
+
+from tap_dash_hudson.sessions import httpx, to_httpx_headers, to_requests_response
+from tap_dash_hudson.throttle import get_retry_wait
+
+if TYPE_CHECKING:
+    from tap_dash_hudson.client import DashHudsonStream
+
+DEFAULT_ASYNC_CONCURRENCY = 10
+
+
+# Marks the end of a unit's pages in its queue.
+_DONE = object()
+
+
+class _UnitPages:
+    """Pages of one request unit, fetched on the event loop and read from a thread.
+
+    At most one fetched page waits to be read, so a unit holds one response in
+    memory however many pages it has.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        pages: AsyncGenerator[requests.Response, None],
+    ) -> None:
+        self.loop = loop
+        self._pages = pages
+        self._queue: Optional["asyncio.Queue[Any]"] = None
+        self._task: Optional["asyncio.Future[None]"] = None
+        asyncio.run_coroutine_threadsafe(self._start(), loop).result()
+
+    def __iter__(self) -> Iterator[requests.Response]:
+        queue = self._queue
+        assert queue is not None
+        try:
+            while True:
+                item = asyncio.run_coroutine_threadsafe(queue.get(), self.loop).result()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        """Stop fetching pages that have not been requested yet."""
+        if self._task is not None:
+            self.loop.call_soon_threadsafe(self._task.cancel)
+
+    async def _start(self) -> None:
+        # The queue and task belong to the loop, so they are created on it.
+        self._queue = asyncio.Queue(maxsize=1)
+        self._task = asyncio.ensure_future(self._produce(self._queue))
+
+    async def _produce(self, queue: "asyncio.Queue[Any]") -> None:
+        try:
+            async for response in self._pages:
+                await queue.put(response)
+        except Exception as exc:
+            await queue.put(exc)
+        else:
+            await queue.put(_DONE)
+        finally:
+            await self._pages.aclose()
+
+
+class AsyncRequestEngine:
+    """Send the requests of every stream from one asyncio event loop.
+
+    The loop runs in a background thread and keeps one httpx client per
+    backend host. Streams hand it the independent request units of a
+    partition, such as date windows, and each unit's pages are requested
+    without blocking other units, partitions or streams. Requests are built
+    and responses validated with the stream's own hooks, and the responses
+    are returned as `requests.Response` objects so `parse_response` and
+    `post_process` run unchanged.
+    """
+
+    def __init__(
+        self, concurrency: int = DEFAULT_ASYNC_CONCURRENCY, http2: bool = False
+    ) -> None:
+        """Initialize the engine and start its event loop."""
+        if httpx is None:
+            raise ImportError("The async request engine requires the `httpx` package.")
+        self._httpx = httpx
+        self.concurrency = concurrency
+        self.http2 = http2
+        self.loop = asyncio.new_event_loop()
+        self._clients: Dict[str, Any] = {}
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def iter_unit_responses(
+        self,
+        stream: "DashHudsonStream",
+        context: Optional[dict],
+        units: Sequence[Any],
+    ) -> Iterator[Iterator[requests.Response]]:
+        """Yield an iterator over each unit's pages, in the order of `units`.
+
+        Up to `concurrency` units are fetched at once. Pages are yielded as they
+        arrive, and each unit fetches its next page once the last one is read.
+        """
+        remaining = iter(units)
+        pending: Deque[_UnitPages] = deque()
+        try:
+            while True:
+                for unit in islice(remaining, self.concurrency - len(pending)):
+                    pending.append(
+                        _UnitPages(self.loop, self._fetch_unit(stream, context, unit))
+                    )
+                if not pending:
+                    return
+                unit_pages = pending.popleft()
+                yield iter(unit_pages)
+                unit_pages.cancel()
+        finally:
+            for unit_pages in pending:
+                unit_pages.cancel()
+
+    def close(self) -> None:
+        """Close the httpx clients and stop the event loop."""
+        for client in self._clients.values():
+            asyncio.run_coroutine_threadsafe(client.aclose(), self.loop).result()
+        shutdown = self.loop.shutdown_asyncgens()
+        asyncio.run_coroutine_threadsafe(shutdown, self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+    def _get_client(self, url_base: str) -> Any:
+        # Only called on the loop thread, so no locking is needed.
+        if url_base not in self._clients:
+            self._clients[url_base] = self._httpx.AsyncClient(
+                http2=self.http2,
+                limits=self._httpx.Limits(max_connections=self.concurrency),
+            )
+            self._host_limits[url_base] = asyncio.Semaphore(self.concurrency)
+        return self._clients[url_base]
+
+    async def _fetch_unit(
+        self, stream: "DashHudsonStream", context: Optional[dict], unit: Any
+    ) -> AsyncGenerator[requests.Response, None]:
+        next_page_token = unit
+        while True:
+            prepared_request = stream.prepare_request(
+                context, next_page_token=next_page_token
+            )
+            response = await self._send_with_retries(stream, prepared_request, context)
+            stream.update_sync_costs(prepared_request, response, context)
+            yield response
+            previous_token = next_page_token
+            next_page_token = stream.get_next_page_token(response, previous_token)
+            if next_page_token and next_page_token == previous_token:
+                raise RuntimeError(
+                    f"Loop detected in pagination. "
+                    f"Pagination token {next_page_token} is identical to prior token."
+                )
+            if not next_page_token:
+                return
+
+    async def _send_with_retries(
+        self,
+        stream: "DashHudsonStream",
+        prepared_request: requests.PreparedRequest,
+        context: Optional[dict],
+    ) -> requests.Response:
+        client = self._get_client(stream.url_base)
+        max_tries = stream.backoff_max_tries()
+        if callable(max_tries):
+            max_tries = max_tries()
+        attempt = 0
+        while True:
+            # The rate limiter blocks, so wait for it off the loop.
+            await self.loop.run_in_executor(None, stream._before_send, context)
+            try:
+                async with self._host_limits[stream.url_base]:
+                    httpx_response = await client.request(
+                        prepared_request.method,
+                        prepared_request.url,
+                        headers=to_httpx_headers(prepared_request),
+                        content=prepared_request.body,
+                        timeout=stream.timeout,
+                    )
+                response = to_requests_response(httpx_response, prepared_request)
+                stream._after_send(prepared_request, response, context)
+                return response
+            except (RetriableAPIError, self._httpx.TransportError) as ex:
+                attempt += 1
+                if max_tries is not None and attempt >= max_tries:
+                    raise
+                wait = get_retry_wait(getattr(ex, "response", None), attempt)
+                stream.backoff_handler(
+                    {
+                        "target": client.request,
+                        "args": (prepared_request, context),
+                        "kwargs": {},
+                        "tries": attempt,
+                        "wait": wait,
+                    }
+                )
+                await asyncio.sleep(wait)
@@ -0,0 +1,184 @@
+"""Batch output of records to Parquet or Arrow IPC files."""
+
+import datetime
+import importlib
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, DefaultDict, Dict, List, Optional, Tuple
+
+from tap_dash_hudson.writer import MessageWriter
+
+# pyarrow is only needed for batch output, so it is imported by the first
+# BatchWriter rather than when the tap starts.
+pyarrow: Any = None
+
+BATCH_FORMATS = ("parquet", "arrow")
+DEFAULT_BATCH_DIR = "output"
+DEFAULT_BATCH_SIZE = 100000
+
+
+class BatchMessage:
+    """Singer BATCH message pointing a target at files holding a stream's records."""
+
+    def __init__(self, stream: str, file_format: str, manifest: List[str]) -> None:
+        """Initialize the message."""
+        self.stream = stream
+        self.file_format = file_format
+        self.manifest = manifest
+
+    def asdict(self) -> dict:
+        """Return the message as written on STDOUT."""
+        return {
+            "type": "BATCH",
+            "stream": self.stream,
+            "encoding": {"format": self.file_format, "compression": None},
+            "manifest": self.manifest,
+        }
+
+
+def _import_pyarrow() -> None:
+    global pyarrow
+    if pyarrow is None:
+        try:
+            importlib.import_module("pyarrow.feather")
+            importlib.import_module("pyarrow.parquet")
+        except ImportError:
+            raise ImportError("Batch output requires the `pyarrow` package.") from None
+        pyarrow = importlib.import_module("pyarrow")
+
+
+def _to_datetime(value: Any) -> Any:
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def to_arrow_type(schema: dict) -> Any:
+    """Return the Arrow type matching a JSON schema property."""
+    types = schema.get("type", [])
+    if isinstance(types, str):
+        types = [types]
+    if "object" in types and "properties" in schema:
+        return pyarrow.struct(
+            [
+                pyarrow.field(name, to_arrow_type(prop))
+                for name, prop in schema["properties"].items()
+            ]
+        )
+    if "array" in types:
+        return pyarrow.list_(to_arrow_type(schema.get("items", {})))
+    if "integer" in types:
+        return pyarrow.int64()
+    if "number" in types:
+        return pyarrow.float64()
+    if "boolean" in types:
+        return pyarrow.bool_()
+    if schema.get("format") == "date-time":
+        return pyarrow.timestamp("us", tz="UTC")
+    return pyarrow.string()
+
+
+def to_arrow_schema(schema: dict) -> Any:
+    """Return the Arrow schema of a stream's JSON schema."""
+    return pyarrow.schema(
+        [
+            pyarrow.field(name, to_arrow_type(prop))
+            for name, prop in schema["properties"].items()
+        ]
+    )
+
+
+def to_arrow_table(records: List[dict], schema: Any) -> Any:
+    """Return `records` as an Arrow table of `schema`, built column by column."""
+    columns = []
+    for field in schema:
+        values = [record.get(field.name) for record in records]
+        if pyarrow.types.is_timestamp(field.type):
+            values = [_to_datetime(value) for value in values]
+        columns.append(pyarrow.array(values, type=field.type))
+    return pyarrow.Table.from_arrays(columns, schema=schema)
+
+
+class BatchWriter:
+    """Buffer records and write them to files partitioned by stream and brand.
+
+    Files are written as `{stream}/{brand_id}/part-*.{format}` under
+    `output_dir` and announced with a BATCH message. Each file keeps its
+    `brand_id` column, so directories are not named `brand_id=...`, which
+    Hive-aware readers would take as a second, conflicting `brand_id` field.
+    Once `batch_size` records are buffered, every buffer is written out. STATE
+    messages are held back until the records they cover are in files, so a
+    bookmark never moves past records a target has not been pointed at.
+    """
+
+    def __init__(
+        self,
+        message_writer: MessageWriter,
+        output_dir: str,
+        file_format: str = "parquet",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        """Initialize the writer."""
+        _import_pyarrow()
+        if file_format not in BATCH_FORMATS:
+            raise ValueError(f"Unknown batch format '{file_format}'.")
+        self.message_writer = message_writer
+        self.output_dir = Path(output_dir).resolve()
+        self.file_format = file_format
+        self.batch_size = batch_size
+        # The process ID keeps the files of concurrent shard processes apart.
+        self._run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        self._file_count = 0
+        self._buffered = 0
+        self._buffers: DefaultDict[Tuple[str, Any], List[dict]] = defaultdict(list)
+        self._schemas: Dict[str, Any] = {}
+        self._pending_state: Optional[dict] = None
+        # Share the writer's lock so buffering and STATE cannot deadlock.
+        self._lock = message_writer.lock
+
+    def write_record(self, stream_name: str, schema: dict, record: dict) -> None:
+        """Buffer one record of `stream_name`."""
+        with self._lock:
+            if stream_name not in self._schemas:
+                self._schemas[stream_name] = to_arrow_schema(schema)
+            self._buffers[(stream_name, record.get("brand_id"))].append(record)
+            self._buffered += 1
+            if self._buffered >= self.batch_size:
+                self.flush()
+
+    def write_state(self, state: dict) -> None:
+        """Hold back a STATE message until the next flush."""
+        with self._lock:
+            self._pending_state = state
+
+    def flush(self) -> None:
+        """Write every buffered record to files, then the latest STATE."""
+        with self._lock:
+            buffers, self._buffers = self._buffers, defaultdict(list)
+            self._buffered = 0
+            for (stream_name, brand_id), records in buffers.items():
+                path = self._write_file(stream_name, brand_id, records)
+                self.message_writer.write_message(
+                    BatchMessage(stream_name, self.file_format, [path.as_uri()])
+                )
+            if self._pending_state is not None:
+                self.message_writer.write_state(self._pending_state)
+                self._pending_state = None
+
+    def _write_file(self, stream_name: str, brand_id: Any, records: List[dict]) -> Path:
+        table = to_arrow_table(records, self._schemas[stream_name])
+        directory = self.output_dir / stream_name / str(brand_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        self._file_count += 1
+        path = (
+            directory / f"part-{self._run_id}-{self._file_count:05d}.{self.file_format}"
+        )
+        if self.file_format == "parquet":
+            pyarrow.parquet.write_table(table, path)
+        else:
+            pyarrow.feather.write_feather(table, path, compression="uncompressed")
+        return path
@@ -0,0 +1,169 @@
+"""On-disk cache of API responses, revalidated with conditional requests."""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_TTL_SECONDS = 3600
+DEFAULT_CACHE_MAX_MB = 100
+
+# Response headers kept with a cached body.
+_CACHED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+class CachedResponse:
+    """A cached response body and the validators needed to revalidate it."""
+
+    def __init__(self, path: Path, metadata: dict) -> None:
+        """Initialize the cached response."""
+        self.path = path
+        self.metadata = metadata
+
+    @property
+    def age(self) -> float:
+        """Return the seconds since the response was stored or revalidated."""
+        return time.time() - self.metadata["stored_at"]
+
+    @property
+    def conditional_headers(self) -> Dict[str, str]:
+        """Return the headers asking the server to answer 304 if unchanged."""
+        headers = {}
+        if self.metadata["headers"].get("ETag"):
+            headers["If-None-Match"] = self.metadata["headers"]["ETag"]
+        if self.metadata["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = self.metadata["headers"]["Last-Modified"]
+        return headers
+
+    def to_response(self, request: requests.PreparedRequest) -> requests.Response:
+        """Return the cached body as a response to `request`."""
+        content = self.path.read_bytes()
+        response = requests.Response()
+        response.status_code = 200
+        response.headers = CaseInsensitiveDict(self.metadata["headers"])
+        response._content = content
+        response.raw = io.BytesIO(content)
+        response.url = request.url or ""
+        response.encoding = "utf-8"
+        response.request = request
+        return response
+
+
+class ResponseCache:
+    """Size-bounded LRU cache of response bodies on disk.
+
+    Entries are keyed by the request method, URL with its query string and
+    credentials, and are served without a request for `ttl` seconds. Older
+    entries are revalidated with `If-None-Match`/`If-Modified-Since` when the
+    API sent an `ETag` or `Last-Modified`, so an unchanged resource costs a
+    304 instead of a full download. Once the bodies exceed `max_bytes` the
+    least recently used entries are evicted. Body sizes are kept in an
+    in-memory LRU index, read from the directory once, so storing a response
+    does not scan the cache.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl: float = DEFAULT_CACHE_TTL_SECONDS,
+        max_bytes: int = DEFAULT_CACHE_MAX_MB * 1024 * 1024,
+    ) -> None:
+        """Initialize the cache."""
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Body sizes by key, least recently used first.
+        self._sizes: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+
+    @staticmethod
+    def get_key(request: requests.PreparedRequest) -> str:
+        """Return the cache key of a request."""
+        parts = [
+            request.method or "GET",
+            request.url or "",
+            request.headers.get("Authorization", ""),
+        ]
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the entry stored under `key`, marking it recently used."""
+        metadata_path = self.directory / f"{key}.json"
+        body_path = self.directory / f"{key}.body"
+        with self._lock:
+            try:
+                metadata = json.loads(metadata_path.read_text())
+                os.utime(body_path)
+            except (OSError, ValueError):
+                return None
+            sizes = self._get_sizes()
+            if key in sizes:
+                sizes.move_to_end(key)
+        return CachedResponse(body_path, metadata)
+
+    def put(self, key: str, response: requests.Response) -> CachedResponse:
+        """Store a successful response under `key`."""
+        metadata = {
+            "url": response.url,
+            "stored_at": time.time(),
+            "headers": {
+                name: response.headers[name]
+                for name in _CACHED_HEADERS
+                if name in response.headers
+            },
+        }
+        body_path = self.directory / f"{key}.body"
+        with self._lock:
+            # Write then rename so readers never see a partial entry.
+            tmp_path = body_path.with_suffix(".tmp")
+            tmp_path.write_bytes(response.content)
+            os.replace(tmp_path, body_path)
+            (self.directory / f"{key}.json").write_text(json.dumps(metadata))
+            sizes = self._get_sizes()
+            self._total += len(response.content) - sizes.pop(key, 0)
+            sizes[key] = len(response.content)
+            self._evict(keep=key)
+        return CachedResponse(body_path, metadata)
+
+    def refresh(self, entry: CachedResponse) -> None:
+        """Restart the TTL of an entry the server confirmed is unchanged."""
+        entry.metadata["stored_at"] = time.time()
+        with self._lock:
+            entry.path.with_suffix(".json").write_text(json.dumps(entry.metadata))
+
+    def _get_sizes(self) -> "OrderedDict[str, int]":
+        # Called under the lock. The directory is only scanned on first use.
+        if self._sizes is None:
+            bodies = []
+            for path in self.directory.glob("*.body"):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                bodies.append((stat.st_mtime, path.stem, stat.st_size))
+            self._sizes = OrderedDict((key, size) for _, key, size in sorted(bodies))
+            self._total = sum(self._sizes.values())
+        return self._sizes
+
+    def _evict(self, keep: str) -> None:
+        sizes = self._get_sizes()
+        while self._total > self.max_bytes:
+            key = next(iter(sizes))
+            if key == keep:
+                break
+            self._total -= sizes.pop(key)
+            for suffix in (".body", ".json"):
+                try:
+                    (self.directory / f"{key}{suffix}").unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,121 @@
+"""Record-level change detection for full-table streams."""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+# (scope, key) of a record, both JSON encoded.
+RecordId = Tuple[str, str]
+
+
+def get_digest(record: dict) -> str:
+    """Return a digest of a record's content."""
+    content = json.dumps(record, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+class ChangeIndex:
+    """SQLite file holding the digest of every record last emitted, by primary key.
+
+    Records are scoped by brand, so keys missing from a run are only treated as
+    deleted for the brands that run synced.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the index."""
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " stream TEXT NOT NULL, scope TEXT NOT NULL, key TEXT NOT NULL,"
+                " digest TEXT NOT NULL, PRIMARY KEY (stream, scope, key))"
+            )
+
+    def load(self, stream_name: str) -> Dict[RecordId, str]:
+        """Return the digests stored for a stream."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT scope, key, digest FROM records WHERE stream = ?",
+                (stream_name,),
+            ).fetchall()
+        return {(scope, key): digest for scope, key, digest in rows}
+
+    def replace(
+        self, stream_name: str, scopes: Iterable[str], digests: Dict[RecordId, str]
+    ) -> None:
+        """Replace a stream's digests for `scopes` in one transaction.
+
+        With no `scopes`, the digests are merged into those already stored.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM records WHERE stream = ? AND scope = ?",
+                [(stream_name, scope) for scope in scopes],
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)",
+                [
+                    (stream_name, scope, key, digest)
+                    for (scope, key), digest in digests.items()
+                ],
+            )
+
+
+class ChangeTracker:
+    """Tell which records of one full-table sync are new or changed.
+
+    Digests seen during the sync are only written to the index by `commit`,
+    after every record was written, so an interrupted run re-emits its rows
+    rather than losing them.
+    """
+
+    def __init__(
+        self, index: ChangeIndex, stream_name: str, primary_keys: Sequence[str]
+    ) -> None:
+        """Initialize the tracker."""
+        self.index = index
+        self.stream_name = stream_name
+        self.primary_keys = list(primary_keys)
+        self.previous = index.load(stream_name)
+        self.current: Dict[RecordId, str] = {}
+
+    def get_record_id(self, record: dict) -> RecordId:
+        """Return the scope and primary key of a record."""
+        return (
+            json.dumps(record.get("brand_id"), default=str),
+            json.dumps([record.get(key) for key in self.primary_keys], default=str),
+        )
+
+    def is_changed(self, record: dict) -> bool:
+        """Record having seen `record`, returning whether it differs from the index."""
+        record_id = self.get_record_id(record)
+        digest = get_digest(record)
+        self.current[record_id] = digest
+        return self.previous.get(record_id) != digest
+
+    def get_removed(self, scopes: Iterable[Any]) -> List[dict]:
+        """Return the primary keys of indexed records missing from this sync."""
+        synced = {json.dumps(scope, default=str) for scope in scopes}
+        removed = []
+        for scope, key in self.previous.keys() - self.current.keys():
+            if scope in synced:
+                record = dict(zip(self.primary_keys, json.loads(key)))
+                record["brand_id"] = json.loads(scope)
+                removed.append(record)
+        return removed
+
+    def merge(self) -> None:
+        """Store the digests of a partial sync, keeping those it did not see."""
+        self.index.replace(self.stream_name, [], self.current)
+
+    def commit(self, scopes: Iterable[Any]) -> None:
+        """Store the digests of this sync for the synced scopes."""
+        self.index.replace(
+            self.stream_name,
+            [json.dumps(scope, default=str) for scope in scopes],
+            self.current,
+        )
@@ -1,53 +1,661 @@
 """REST client handling, including DashHudsonStream base class."""
 
-import requests
+import datetime
+import functools
+import importlib
+import sys
+import threading
+import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, Optional, Union, List, Iterable
-
-from memoization import cached
+from types import ModuleType
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
+import backoff
+import requests
+from singer import RecordMessage
+from singer_sdk.authenticators import BearerTokenAuthenticator
+from singer_sdk.exceptions import RetriableAPIError
+from singer_sdk.helpers._catalog import pop_deselected_record_properties
+from singer_sdk.helpers._util import utc_now
 from singer_sdk.helpers.jsonpath import extract_jsonpath
 from singer_sdk.streams import RESTStream
-from singer_sdk.authenticators import BearerTokenAuthenticator
+from urllib3.util.request import ACCEPT_ENCODING
+
+from tap_dash_hudson.archive import ResponseArchive
+from tap_dash_hudson.batch import BatchWriter
+from tap_dash_hudson.cache import ResponseCache
+from tap_dash_hudson.changes import ChangeTracker
+from tap_dash_hudson.concurrency import Prefetcher, ordered_map, prefetch
+from tap_dash_hudson.conform import RecordConformer
+from tap_dash_hudson.metrics import Labels, MetricsRegistry, to_labels
+from tap_dash_hudson.planner import (
+    DEFAULT_LOOKBACK_DAYS,
+    DateRange,
+    merge_ranges,
+    plan_ranges,
+    ranges_from_state,
+    ranges_to_state,
+    split_range,
+)
+from tap_dash_hudson.streaming import iter_items
+from tap_dash_hudson.throttle import TokenBucket, get_retry_wait
+from tap_dash_hudson.transform import Columns, iter_metric_rows
+from tap_dash_hudson.writer import MessageWriter
 
+if TYPE_CHECKING:
+    from tap_dash_hudson.tap import TapDashHudson
+
+orjson: Optional[ModuleType]
+try:
+    orjson = importlib.import_module("orjson")
+except ImportError:  # orjson is an optional speedup
+    orjson = None
 
 SCHEMAS_DIR = Path(__file__).parent / Path("./schemas")
 
+DEFAULT_API_URL = "https://{service}.dashhudson.com"
+DEFAULT_BRAND_CONCURRENCY = 4
+DEFAULT_DATE_CONCURRENCY = 4
+DEFAULT_WINDOW_DAYS = 30
+DEFAULT_PREFETCH_PAGES = 1
+DEFAULT_PREFETCH_BUFFER_MB = 64
+
+_JSON_CACHE_ATTR = "_dash_hudson_json"
+_STREAMED_CAPTURES_ATTR = "_dash_hudson_streamed_captures"
+
+T = TypeVar("T")
+
+# A prefetched partition's record, or a callback to run before the next one.
+_PartitionItem = Tuple[Optional[dict], Optional[Callable[[], None]]]
+
+
+def get_brand_ids(config: Mapping[str, Any]) -> List[int]:
+    """Return the brand IDs to sync, accepting the legacy single `brand_id`."""
+    if config.get("brand_ids"):
+        return list(config["brand_ids"])
+    if config.get("brand_id") is not None:
+        return [config["brand_id"]]
+    raise ValueError("One of `brand_ids` or `brand_id` must be configured.")
+
+
+def migrate_legacy_state(state: dict, config: Mapping[str, Any]) -> dict:
+    """Return `state` with stream-level bookmarks moved into their brand's partition.
+
+    Before brands were partitions, each stream was bookmarked as a whole for
+    the single configured brand: `brand_id`, or the only entry of `brand_ids`.
+    Bookmarks already kept by that brand's partition are left as they are.
+    """
+    brand_id = config.get("brand_id")
+    if brand_id is None and len(config.get("brand_ids") or []) == 1:
+        brand_id = config["brand_ids"][0]
+    if brand_id is None:
+        return state
+    bookmarks = {}
+    for stream_name, stream_state in state.get("bookmarks", {}).items():
+        stream_state = dict(stream_state)
+        if stream_state.get("replication_key_value") is not None:
+            legacy = {
+                key: stream_state.pop(key)
+                for key in ("replication_key", "replication_key_value")
+                if key in stream_state
+            }
+            partitions = [
+                dict(partition) for partition in stream_state.get("partitions", [])
+            ]
+            partition = next(
+                (p for p in partitions if p.get("context") == {"brand_id": brand_id}),
+                None,
+            )
+            if partition is None:
+                partition = {"context": {"brand_id": brand_id}}
+                partitions.append(partition)
+            if partition.get("replication_key_value") is None:
+                partition.update(legacy)
+            stream_state["partitions"] = partitions
+        bookmarks[stream_name] = stream_state
+    return {**state, "bookmarks": bookmarks}
+
+
+def estimate_records_size(records: List[dict]) -> int:
+    """Return the approximate size of `records`, all as long as the first."""
+    if not records:
+        return 0
+    return len(repr(records[0])) * len(records)
+
+
+class _SampledRecordSize:
+    """Size records by the repr of every `every`-th one, which is cheap on average."""
+
+    def __init__(self, every: int = 100) -> None:
+        self.every = every
+        self._count = 0
+        self._size = 0
+
+    def __call__(self, item: "_PartitionItem") -> int:
+        record, _ = item
+        if record is None:
+            return 0
+        if self._count % self.every == 0:
+            self._size = len(repr(record))
+        self._count += 1
+        return self._size
+
+
+def get_response_size(response: requests.Response) -> int:
+    """Return the bytes of a response body on the wire, before any decompression."""
+    if "Content-Length" in response.headers:
+        return int(response.headers["Content-Length"])
+    if response._content is not False:
+        return len(response._content or b"")
+    return 0
+
 
 class DashHudsonStream(RESTStream):
     """DashHudson stream class."""
 
+    _tap: "TapDashHudson"
+    service: str
+    schema: dict
+
+    def __init__(self, *args, **kwargs) -> None:
+        """Initialize the stream."""
+        super().__init__(*args, **kwargs)
+        self._prefetch = threading.local()
+        self._partition_queue: Optional[
+            Deque[Tuple[dict, Prefetcher[_PartitionItem]]]
+        ] = None
+        self._next_partitions: Iterator[dict] = iter([])
+        self._retry = threading.local()
+        self._authenticator: Optional[BearerTokenAuthenticator] = None
+        self._base_headers: Optional[dict] = None
+        self._record_conformer: Optional[RecordConformer] = None
+        self._selected_properties: Optional[List[str]] = None
+        self._has_deselected_fields: Optional[bool] = None
+        self._change_tracker: Optional[ChangeTracker] = None
+        self._metric_labels: Dict[Any, Labels] = {}
+        if self.tracks_changes and self.config.get("emit_tombstones"):
+            self.schema = {
+                **self.schema,
+                "properties": {
+                    **self.schema["properties"],
+                    "_sdc_deleted_at": {
+                        "type": ["string", "null"],
+                        "format": "date-time",
+                    },
+                },
+            }
+
     @property
     def url_base(self) -> str:
         """Return the API URL root, configurable via tap settings."""
-        return "https://{service}.dashhudson.com".format(service=self.service)
+        return self.config.get("api_url", DEFAULT_API_URL).format(service=self.service)
 
     records_jsonpath = "$[*]"  # Or override `parse_response`.
     next_page_token_jsonpath = "$.paging.next"  # Or override `get_next_page_token`.
+    #: Whether records can be parsed incrementally from `records_jsonpath`.
+    supports_streaming = False
+    # Full-table streams of rarely changing dimensions may serve responses from
+    # the tap's response cache.
+    cacheable = False
+    #: Whether progress through a partition's pages is checkpointed in state, so
+    #: an interrupted full-table sync resumes from the last written page.
+    resumable_pages = False
+    #: Query parameter the endpoint filters its metrics by, when it supports one,
+    #: so only the metrics selected in the catalog are requested.
+    metrics_param: Optional[str] = None
 
     @property
     def authenticator(self) -> BearerTokenAuthenticator:
-        """Return a new authenticator object."""
-        return BearerTokenAuthenticator.create_for_stream(
-            self,
-            token=self.config.get("api_key")
-        )
+        """Return the authenticator object, built once per stream."""
+        if self._authenticator is None:
+            self._authenticator = BearerTokenAuthenticator.create_for_stream(
+                self, token=self.config["api_key"]
+            )
+        return self._authenticator
 
     @property
     def http_headers(self) -> dict:
         """Return the http headers needed."""
-        headers = {}
-        if "user_agent" in self.config:
-            headers["User-Agent"] = self.config.get("user_agent")
-        return headers
+        if self._base_headers is None:
+            headers = {}
+            if "user_agent" in self.config:
+                headers["User-Agent"] = self.config.get("user_agent")
+            # Every encoding urllib3 can decode here: gzip and deflate, plus brotli
+            # and zstd when their packages are installed.
+            headers["Accept-Encoding"] = (
+                ACCEPT_ENCODING
+                if self.config.get("http_compression", True)
+                else "identity"
+            )
+            self._base_headers = headers
+        # Copied, as the SDK adds the auth headers to the returned dict.
+        return dict(self._base_headers)
+
+    @property
+    def requests_session(self) -> requests.Session:
+        """Return the pooled session shared by every stream calling this backend."""
+        return self._tap.get_session(self.url_base)
+
+    def response_json(self, response: requests.Response) -> Any:
+        """Return the decoded response body, decoding each response only once.
+
+        Pagination, record extraction and any other hook share the same decoded
+        object. orjson is used for decoding when it is installed.
+        """
+        if not hasattr(response, _JSON_CACHE_ATTR):
+            if orjson is not None:
+                decoded = orjson.loads(response.content)
+            else:
+                decoded = response.json()
+            setattr(response, _JSON_CACHE_ATTR, decoded)
+        return getattr(response, _JSON_CACHE_ATTR)
+
+    @property
+    def stream_response(self) -> bool:
+        """Return whether response bodies are parsed incrementally as they arrive."""
+        return self.supports_streaming and self.config.get("stream_responses", False)
+
+    @property
+    def rate_limiter(self) -> TokenBucket:
+        """Return the rate limiter shared by all streams calling this backend."""
+        return self._tap.get_rate_limiter(self.service)
+
+    @property
+    def metrics(self) -> MetricsRegistry:
+        """Return the registry collecting the tap's performance metrics."""
+        return self._tap.metrics
+
+    def get_metric_labels(self, brand_id: Any = None) -> Labels:
+        """Return the metric labels of this stream, for one brand if given."""
+        if brand_id not in self._metric_labels:
+            self._metric_labels[brand_id] = to_labels(
+                service=self.service, stream=self.name, brand_id=brand_id
+            )
+        return self._metric_labels[brand_id]
+
+    def _get_context_labels(self, context: Optional[dict]) -> Labels:
+        return self.get_metric_labels(context.get("brand_id") if context else None)
+
+    def request_decorator(self, func: Callable) -> Callable:
+        """Retry throttled, failed and timed out requests.
+
+        Waits come from `backoff_wait_generator` and are already jittered, so
+        backoff's own jitter is disabled. backoff 1.x does not send the failure
+        to the wait generator, so the `giveup` check records it instead.
+        """
+        decorator: Callable = backoff.on_exception(
+            self.backoff_wait_generator,
+            (
+                RetriableAPIError,
+                requests.exceptions.ConnectionError,
+                requests.exceptions.ReadTimeout,
+            ),
+            max_tries=self.backoff_max_tries,
+            giveup=self._record_retry_exception,
+            on_backoff=self.backoff_handler,
+            jitter=None,
+        )(func)
+        return decorator
+
+    def _record_retry_exception(self, exception: Exception) -> bool:
+        # Called by backoff before each wait, on the thread making the request.
+        self._retry.exception = exception
+        return False
+
+    # The SDK passes this method to backoff as the wait generator factory.
+    def backoff_wait_generator(  # type: ignore[override]
+        self,
+    ) -> Generator[float, None, None]:
+        """Yield retry waits honouring `Retry-After`, else full-jitter exponential."""
+        attempt = 0
+        while True:
+            attempt += 1
+            exception = getattr(self._retry, "exception", None)
+            yield get_retry_wait(getattr(exception, "response", None), attempt)
+
+    def backoff_handler(self, details: dict) -> None:
+        """Count the retry, then log it."""
+        context = details["args"][1] if len(details["args"]) > 1 else None
+        self.metrics.add("http_retries_total", self._get_context_labels(context))
+        super().backoff_handler(details)
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        """Return the tap's response cache, if this stream's responses are cached."""
+        if not self.cacheable:
+            return None
+        return self._tap.response_cache
+
+    @property
+    def response_archive(self) -> Optional[ResponseArchive]:
+        """Return the tap's raw response archive, if capture or replay is enabled."""
+        return self._tap.response_archive
+
+    def _request(
+        self, prepared_request: requests.PreparedRequest, context: Optional[dict]
+    ) -> requests.Response:
+        archive = self.response_archive
+        if archive is not None and archive.replay:
+            return archive.get(prepared_request)
+        cache = self.response_cache
+        if cache is not None:
+            response = self._cached_request(cache, prepared_request, context)
+        else:
+            self._before_send(context)
+            response = self.requests_session.send(
+                prepared_request, timeout=self.timeout, stream=self.stream_response
+            )
+            self._after_send(prepared_request, response, context)
+        if archive is not None and response.status_code == 200:
+            return archive.put(prepared_request, response)
+        return response
+
+    def _cached_request(
+        self,
+        cache: ResponseCache,
+        prepared_request: requests.PreparedRequest,
+        context: Optional[dict],
+    ) -> requests.Response:
+        key = cache.get_key(prepared_request)
+        entry = cache.get(key)
+        if entry is not None and entry.age < cache.ttl:
+            return entry.to_response(prepared_request)
+        if entry is not None:
+            prepared_request = prepared_request.copy()
+            prepared_request.headers.update(entry.conditional_headers)
+
+        self._before_send(context)
+        response = self.requests_session.send(prepared_request, timeout=self.timeout)
+        self._after_send(prepared_request, response, context)
+        if response.status_code == 304 and entry is not None:
+            cache.refresh(entry)
+            return entry.to_response(prepared_request)
+        if response.status_code != 200:
+            return response
+        # Served from the stored body, so streamed parsing still has a raw stream.
+        return cache.put(key, response).to_response(prepared_request)
+
+    def _before_send(self, context: Optional[dict]) -> None:
+        throttle_wait = self.rate_limiter.acquire()
+        if throttle_wait:
+            self.metrics.add(
+                "throttle_wait_seconds_total",
+                self._get_context_labels(context),
+                throttle_wait,
+            )
+            self._write_metric_log(
+                {
+                    "type": "timer",
+                    "metric": "throttle_wait_duration",
+                    "value": throttle_wait,
+                    "tags": {"stream": self.name, "service": self.service},
+                },
+                extra_tags={"context": context} if context else None,
+            )
+
+    def _after_send(
+        self,
+        prepared_request: requests.PreparedRequest,
+        response: requests.Response,
+        context: Optional[dict],
+    ) -> None:
+        self.rate_limiter.update(response)
+        labels = self._get_context_labels(context)
+        self.metrics.add(
+            "http_requests_total", labels + (("status", str(response.status_code)),)
+        )
+        self.metrics.observe(
+            "http_request_duration_seconds", labels, response.elapsed.total_seconds()
+        )
+        self.metrics.add(
+            "http_response_bytes_total", labels, get_response_size(response)
+        )
+        if self._LOG_REQUEST_METRICS:
+            extra_tags = {}
+            if self._LOG_REQUEST_METRIC_URLS:
+                extra_tags["url"] = prepared_request.path_url
+            self._write_request_duration_log(
+                endpoint=self.path,
+                response=response,
+                context=context,
+                extra_tags=extra_tags,
+            )
+        self.validate_response(response)
+
+    @property
+    def use_async_engine(self) -> bool:
+        """Return whether requests go through the tap's asyncio engine.
+
+        Cached and archived streams keep to the synchronous path, which owns the
+        cache and the archive.
+        """
+        return (
+            self.config.get("request_engine") == "async"
+            and self.response_cache is None
+            and self.response_archive is None
+        )
+
+    def get_request_units(self, context: Optional[dict]) -> List[Any]:
+        """Return the first page tokens of the independent request sequences.
+
+        By default a partition is one sequence of pages, starting without a token,
+        or from the checkpointed page of an interrupted sync.
+        """
+        progress = self.get_page_progress(context)
+        if progress.get("complete"):
+            return []
+        return [progress.get("page_token")]
+
+    def on_unit_complete(self, context: Optional[dict], unit: Any) -> None:
+        """Handle a request unit whose records have all been written."""
+        self._checkpoint_page(context, None)
+
+    def get_page_progress(self, context: Optional[dict]) -> dict:
+        """Return the checkpointed page progress of a partition.
+
+        Holds the `page_token` of the next page to request, or `complete` once
+        the partition is done. Empty unless an earlier sync was interrupted.
+        """
+        if not self.resumable_pages:
+            return {}
+        with self.message_writer.lock:
+            return dict(self.get_context_state(context).get("page_progress", {}))
+
+    def _checkpoint_page(self, context: Optional[dict], next_page_token: Any) -> None:
+        if not self.resumable_pages:
+            return
+        if next_page_token:
+            progress = {"page_token": next_page_token}
+        else:
+            progress = {"complete": True}
+        with self.message_writer.lock:
+            self.get_context_state(context)["page_progress"] = progress
+        self._write_state_message()
+
+    def get_partition_contexts(self) -> List[Optional[dict]]:
+        """Return the stream's partitions, or a single `None` context without any."""
+        contexts: List[Optional[dict]] = list(self.partitions or [])
+        return contexts or [None]
+
+    def _clear_page_progress(self) -> bool:
+        """Drop the page checkpoints of a finished sync, returning if there were any."""
+        cleared = False
+        with self.message_writer.lock:
+            for partition in self.get_partition_contexts():
+                state = self.get_context_state(partition)
+                cleared = state.pop("page_progress", None) is not None or cleared
+        return cleared
+
+    @property
+    def replaying(self) -> bool:
+        """Return whether records are parsed from archived responses, not requested."""
+        archive = self.response_archive
+        return archive is not None and archive.replay
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Request records, through the asyncio engine when it is enabled.
+
+        When replaying an archive, every response archived for the partition's
+        URL is parsed instead, and state is left as it was.
+        """
+        archive = self.response_archive
+        if archive is not None and archive.replay:
+            for response in archive.iter_responses(self.get_url(context)):
+                yield from self.parse_timed(response, context)
+            return
+        if not self.use_async_engine:
+            yield from self._request_pages(context)
+            return
+
+        units = self.get_request_units(context)
+        unit_responses = self._tap.async_engine.iter_unit_responses(
+            self, context, units
+        )
+        for unit, responses in zip(units, unit_responses):
+            for response in responses:
+                yield from self.parse_timed(response, context)
+            self._after_written(functools.partial(self.on_unit_complete, context, unit))
+
+    def _request_pages(self, context: Optional[dict]) -> Iterable[dict]:
+        # The SDK's paging loop, timing `parse_response` apart from the requests.
+        units = self.get_request_units(context)
+        if not units:
+            return
+        if not self.stream_response:
+            pages = self.prefetch_pages(
+                self._iter_pages(context, units[0]), lambda page: len(page[0].content)
+            )
+            for response, next_page_token in pages:
+                yield from self.parse_timed(response, context)
+                self._after_written(
+                    functools.partial(self._checkpoint_page, context, next_page_token)
+                )
+            return
+
+        # Streamed pages only have their next page token once they are parsed.
+        decorated_request = self.request_decorator(self._request)
+        next_page_token = units[0]
+        while True:
+            prepared_request = self.prepare_request(
+                context, next_page_token=next_page_token
+            )
+            response = decorated_request(prepared_request, context)
+            self.update_sync_costs(prepared_request, response, context)
+            yield from self.parse_timed(response, context)
+            next_page_token = self._get_checked_page_token(response, next_page_token)
+            self._after_written(
+                functools.partial(self._checkpoint_page, context, next_page_token)
+            )
+            if not next_page_token:
+                return
+
+    def _iter_pages(
+        self, context: Optional[dict], next_page_token: Any
+    ) -> Iterator[Tuple[requests.Response, Any]]:
+        """Yield each page's response with the token of the page after it."""
+        decorated_request = self.request_decorator(self._request)
+        while True:
+            prepared_request = self.prepare_request(
+                context, next_page_token=next_page_token
+            )
+            response = decorated_request(prepared_request, context)
+            self.update_sync_costs(prepared_request, response, context)
+            next_page_token = self._get_checked_page_token(response, next_page_token)
+            yield response, next_page_token
+            if not next_page_token:
+                return
+
+    def _get_checked_page_token(
+        self, response: requests.Response, previous_token: Optional[Any]
+    ) -> Optional[Any]:
+        next_page_token = self.get_next_page_token(response, previous_token)
+        if next_page_token and next_page_token == previous_token:
+            raise RuntimeError(
+                f"Loop detected in pagination. "
+                f"Pagination token {next_page_token} is identical to prior token."
+            )
+        return next_page_token
+
+    def prefetch_pages(
+        self, pages: Iterable[T], get_size: Callable[[T], int]
+    ) -> Iterator[T]:
+        """Return `pages`, requested in the background while earlier ones are parsed.
+
+        Up to `prefetch_pages` pages are held ahead of the one being processed,
+        and no more are requested while those hold `prefetch_buffer_mb`, so a
+        slow target holds the requests back. `get_size` measures what a page
+        holds in memory: its decompressed body, or its parsed records.
+        """
+        return prefetch(
+            pages,
+            self.config.get("prefetch_pages", DEFAULT_PREFETCH_PAGES),
+            self.config.get("prefetch_buffer_mb", DEFAULT_PREFETCH_BUFFER_MB)
+            * 1024
+            * 1024,
+            get_size,
+        )
+
+    def parse_timed(
+        self, response: requests.Response, context: Optional[dict]
+    ) -> Iterator[dict]:
+        """Return `parse_response`, adding the time spent parsing to the metrics."""
+        return self.metrics.timed(
+            self.parse_response(response),
+            "parse_seconds_total",
+            self._get_context_labels(context),
+        )
+
+    def parse_response(self, response: requests.Response) -> Iterable[dict]:
+        """Return records from the decoded response at `records_jsonpath`."""
+        if self.stream_response:
+            yield from self._parse_streamed_response(response)
+            return
+        yield from extract_jsonpath(
+            self.records_jsonpath, input=self.response_json(response)
+        )
+
+    def _parse_streamed_response(self, response: requests.Response) -> Iterable[dict]:
+        # The pagination token is captured in the same pass over the body.
+        captures: Dict[str, Any] = {}
+        if self.next_page_token_jsonpath:
+            captures[self.next_page_token_jsonpath] = None
+        setattr(response, _STREAMED_CAPTURES_ATTR, captures)
+        response.raw.decode_content = True
+        try:
+            yield from iter_items(
+                cast(IO[bytes], response.raw), self.records_jsonpath, captures
+            )
+        finally:
+            response.close()
 
     def get_next_page_token(
         self, response: requests.Response, previous_token: Optional[Any]
     ) -> Optional[Any]:
         """Return a token for identifying next page or None if no more pages."""
+        if hasattr(response, _STREAMED_CAPTURES_ATTR):
+            captures = getattr(response, _STREAMED_CAPTURES_ATTR)
+            return captures.get(self.next_page_token_jsonpath)
         if self.next_page_token_jsonpath:
             all_matches = extract_jsonpath(
-                self.next_page_token_jsonpath, response.json()
+                self.next_page_token_jsonpath, self.response_json(response)
             )
             first_match = next(iter(all_matches), None)
             next_page_token = first_match
@@ -55,6 +663,513 @@ class DashHudsonStream(RESTStream):
             next_page_token = response.headers.get("X-Next-Page", None)
         return next_page_token
 
+    @property
+    def partitions(self) -> Optional[List[dict]]:
+        """Return one partition per configured brand, keeping bookmarks per brand."""
+        return [{"brand_id": brand_id} for brand_id in get_brand_ids(self.config)]
+
+    @property
+    def brand_concurrency(self) -> int:
+        """Return the number of brands fetched at the same time."""
+        return self.config.get("brand_concurrency", DEFAULT_BRAND_CONCURRENCY)
+
+    def get_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Return records for a brand partition.
+
+        The SDK syncs partitions one after another, so when several brands are
+        configured the upcoming partitions are fetched ahead of time on
+        background threads, `brand_concurrency` brands at a time. Each stops
+        once its records fill its share of `prefetch_buffer_mb`. Records are
+        handed back in partition order, which keeps the Singer output
+        deterministic.
+        """
+        partitions = self.partitions or []
+        if context is None or self.brand_concurrency <= 1 or len(partitions) <= 1:
+            yield from super().get_records(context)
+            return
+
+        partition, items = self._pop_prefetched_partition(partitions)
+        try:
+            if partition != context:
+                raise RuntimeError(
+                    f"Partition {context} requested out of order, expected {partition}."
+                )
+            for record, callback in items:
+                if callback is not None:
+                    callback()
+                if record is not None:
+                    yield record
+        except BaseException:
+            items.close()
+            for _, prefetcher in self._partition_queue or []:
+                prefetcher.close()
+            self._partition_queue = None
+            raise
+
+    def _pop_prefetched_partition(
+        self, partitions: List[dict]
+    ) -> Tuple[dict, Prefetcher["_PartitionItem"]]:
+        # Start fetching up to `brand_concurrency` partitions, then take the first.
+        if self._partition_queue is None:
+            for partition in partitions:
+                # Seed every brand's starting bookmark before workers read it.
+                self._write_starting_replication_value(partition)
+            self._partition_queue = deque()
+            self._next_partitions = iter(partitions)
+        queue = self._partition_queue
+        upcoming = islice(self._next_partitions, self.brand_concurrency - len(queue))
+        for partition in upcoming:
+            queue.append((partition, self._prefetch_partition(partition)))
+        prefetched = queue.popleft()
+        if not queue:
+            self._partition_queue = None
+        return prefetched
+
+    def _prefetch_partition(self, partition: dict) -> Prefetcher["_PartitionItem"]:
+        budget = self.config.get("prefetch_buffer_mb", DEFAULT_PREFETCH_BUFFER_MB)
+        return Prefetcher(
+            self._iter_partition(partition),
+            max_items=sys.maxsize,
+            max_bytes=budget * 1024 * 1024 // self.brand_concurrency,
+            get_size=_SampledRecordSize(),
+        ).start()
+
+    def _iter_partition(self, partition: dict) -> Iterator["_PartitionItem"]:
+        # Records, each after the callbacks registered before it was yielded.
+        callbacks: List[Callable[[], None]] = []
+        self._prefetch.callbacks = callbacks
+        try:
+            for record in super().get_records(partition):
+                while callbacks:
+                    yield None, callbacks.pop(0)
+                yield record, None
+            while callbacks:
+                yield None, callbacks.pop(0)
+        finally:
+            self._prefetch.callbacks = None
+
+    def _after_written(self, callback: Callable[[], None]) -> None:
+        """Run `callback` once every record yielded so far has been written.
+
+        Records of prefetched partitions are queued, so their callbacks are
+        queued with them and run once the records before them are handed to
+        the SDK.
+        """
+        callbacks = getattr(self._prefetch, "callbacks", None)
+        if callbacks is None:
+            callback()
+        else:
+            callbacks.append(callback)
+
+    @property
+    def message_writer(self) -> MessageWriter:
+        """Return the writer shared by all streams of the tap."""
+        return self._tap.message_writer
+
+    def _write_schema_message(self) -> None:
+        for schema_message in self._generate_schema_messages():
+            self.message_writer.write_message(schema_message)
+
+    @property
+    def selected_properties(self) -> List[str]:
+        """Return the top-level schema properties selected in the catalog."""
+        if self._selected_properties is None:
+            mask = self.mask
+            self._selected_properties = [
+                name
+                for name in self.schema["properties"]
+                if mask.get(("properties", name), True)
+            ]
+        return self._selected_properties
+
+    @property
+    def has_deselected_fields(self) -> bool:
+        """Return whether any property, at any depth, is deselected in the catalog."""
+        if self._has_deselected_fields is None:
+            self._has_deselected_fields = not all(self.mask.values())
+        return self._has_deselected_fields
+
+    def get_selected_metrics(self) -> Optional[List[str]]:
+        """Return the selected metric properties, or None if all are selected.
+
+        Metrics are the properties besides the brand, keys and bookmark.
+        """
+        keys = {"brand_id", self.replication_key, *(self.primary_keys or [])}
+        metrics = [name for name in self.schema["properties"] if name not in keys]
+        selected = set(self.selected_properties)
+        if all(name in selected for name in metrics):
+            return None
+        return [name for name in metrics if name in selected]
+
+    def select_fields(self, row: dict) -> dict:
+        """Return `row` without the fields deselected in the catalog.
+
+        Lets wide payloads be pruned before their rows are built, rather than
+        after, by the SDK.
+        """
+        if len(self.selected_properties) == len(self.schema["properties"]):
+            return row
+        return {name: row[name] for name in self.selected_properties if name in row}
+
+    @property
+    def record_conformer(self) -> RecordConformer:
+        """Return the converter compiled from this stream's schema."""
+        if self._record_conformer is None:
+            self._record_conformer = RecordConformer(
+                self.name,
+                self.schema,
+                self.logger,
+                validate=self.config.get("validate_records", False),
+                coerce=self.config.get("coerce_types", False),
+            )
+        return self._record_conformer
+
+    def _generate_record_messages(
+        self, record: dict
+    ) -> Generator[RecordMessage, None, None]:
+        if self.has_deselected_fields:
+            pop_deselected_record_properties(
+                record, self.schema, self.mask, self.logger
+            )
+        record = self.record_conformer.conform(record)
+        for stream_map in self.stream_maps:
+            mapped_record = stream_map.transform(record)
+            if mapped_record is not None:
+                yield RecordMessage(
+                    stream=stream_map.stream_alias,
+                    record=mapped_record,
+                    version=None,
+                    time_extracted=utc_now(),
+                )
+
+    @property
+    def batch_writer(self) -> Optional[BatchWriter]:
+        """Return the tap's batch file writer, if batch output is enabled."""
+        return self._tap.batch_writer
+
+    def _write_record_message(self, record: dict) -> None:
+        started = time.perf_counter()
+        self._emit_record_message(record)
+        labels = self.get_metric_labels(record.get("brand_id"))
+        self.metrics.add("write_seconds_total", labels, time.perf_counter() - started)
+        self.metrics.add("records_total", labels)
+
+    def _emit_record_message(self, record: dict) -> None:
+        tracker = self._change_tracker
+        if tracker is not None and not tracker.is_changed(record):
+            return
+        batch_writer = self.batch_writer
+        if batch_writer is None:
+            for record_message in self._generate_record_messages(record):
+                self.message_writer.write_message(record_message)
+            return
+        schemas = {
+            stream_map.stream_alias: stream_map.transformed_schema
+            for stream_map in self.stream_maps
+        }
+        for record_message in self._generate_record_messages(record):
+            batch_writer.write_record(
+                record_message.stream,
+                schemas[record_message.stream],
+                record_message.record,
+            )
+
+    def _write_state_message(self) -> None:
+        with self.message_writer.lock:
+            if self.batch_writer is not None:
+                self.batch_writer.write_state(self.tap_state)
+            else:
+                self.message_writer.write_state(self.tap_state)
+
+    @property
+    def tracks_changes(self) -> bool:
+        """Return whether only new or changed records are emitted."""
+        return (
+            self.replication_key is None
+            and bool(self.primary_keys)
+            and bool(self.config.get("change_detection_db"))
+        )
+
+    def _sync_records(self, context: Optional[dict] = None) -> None:
+        started = time.perf_counter()
+        try:
+            self._sync_records_once(context)
+        finally:
+            self.metrics.add(
+                "sync_seconds_total",
+                self.get_metric_labels(),
+                time.perf_counter() - started,
+            )
+        self._write_stream_metric_logs()
+
+    def _sync_records_once(self, context: Optional[dict]) -> None:
+        partitions = self.get_partition_contexts()
+        resumed = self.resumable_pages and any(
+            self.get_page_progress(partition) for partition in partitions
+        )
+        if resumed:
+            self.logger.info(f"Resuming the interrupted sync of '{self.name}'.")
+        if self.tracks_changes and context is None:
+            self._change_tracker = ChangeTracker(
+                self._tap.change_index, self.name, self.primary_keys or []
+            )
+        try:
+            super()._sync_records(context)
+            if self._change_tracker is not None:
+                self._finish_change_tracking(self._change_tracker, resumed)
+        finally:
+            self._change_tracker = None
+        if self.resumable_pages and self._clear_page_progress():
+            self._write_state_message()
+        if self.batch_writer is not None:
+            self.batch_writer.flush()
+
+    def _write_stream_metric_logs(self) -> None:
+        totals = self.metrics.get_counters(service=self.service, stream=self.name)
+        seconds = totals.get("sync_seconds_total")
+        if seconds:
+            totals["records_per_second"] = totals.get("records_total", 0) / seconds
+        for name, value in sorted(totals.items()):
+            self._write_metric_log(
+                {
+                    "type": "timer" if name.endswith("_seconds_total") else "counter",
+                    "metric": name,
+                    "value": value,
+                    "tags": {"stream": self.name, "service": self.service},
+                },
+                extra_tags=None,
+            )
+
+    def _finish_change_tracking(self, tracker: ChangeTracker, resumed: bool) -> None:
+        self._change_tracker = None
+        if resumed:
+            # Records of pages synced before the interruption were not seen again,
+            # so missing keys cannot be told apart from deleted ones.
+            tracker.merge()
+            return
+        # Every brand was synced in full, so keys missing from it were deleted.
+        brand_ids = get_brand_ids(self.config)
+        if self.config.get("emit_tombstones"):
+            deleted_at = utc_now().isoformat()
+            for record in tracker.get_removed(brand_ids):
+                record["_sdc_deleted_at"] = deleted_at
+                self._write_record_message(record)
+        tracker.commit(brand_ids)
+
+    # The tap state is shared between streams that may sync on different threads,
+    # so anything mutating it holds the writer lock.
+
+    def get_context_state(self, context: Optional[dict]) -> dict:
+        """Return the state of `context`, guarded against concurrent writes."""
+        with self.message_writer.lock:
+            return super().get_context_state(context)
+
+    def _write_starting_replication_value(self, context: Optional[dict]) -> None:
+        with self.message_writer.lock:
+            super()._write_starting_replication_value(context)
+
+    def _increment_stream_state(
+        self, latest_record: Dict[str, Any], *, context: Optional[dict] = None
+    ) -> None:
+        with self.message_writer.lock:
+            super()._increment_stream_state(latest_record, context=context)
+
+    def finalize_state_progress_markers(self, state: Optional[dict] = None) -> None:
+        """Finalize progress markers while no STATE message is being written."""
+        with self.message_writer.lock:
+            super().finalize_state_progress_markers(state)
+
     def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["brand_id"] = self.config["brand_id"]
+        """Add the brand to `row` and time the call."""
+        started = time.perf_counter()
+        row["brand_id"] = context["brand_id"] if context else self.config["brand_id"]
+        self.metrics.add(
+            "post_process_seconds_total",
+            self._get_context_labels(context),
+            time.perf_counter() - started,
+        )
         return row
+
+
+class DashHudsonTimeseriesStream(DashHudsonStream):
+    """DashHudson stream for daily metrics requested over a date range.
+
+    Each brand's state records the date ranges already synced. A sync requests
+    the gaps between `start_date` and `end_date` (or yesterday), plus the last
+    `restatement_lookback_days` days synced, split into windows of
+    `window_days` days. Each window is one request, windows can be fetched
+    concurrently, and state is checkpointed after every window so a failed
+    backfill resumes from the last completed window.
+    """
+
+    replication_key = "date"
+    #: Fixed window size for endpoints that only accept a single day.
+    window_days: Optional[int] = None
+    #: Query parameters sent with every window besides the date range.
+    url_params: Dict[str, Any] = {"scale": "DAILY"}
+
+    def get_url_params(
+        self, context: Optional[dict], next_page_token: Optional[Any]
+    ) -> Dict[str, Any]:
+        """Return the query parameters for one date window."""
+        window_start, window_end = cast(DateRange, next_page_token)
+        params: dict = {
+            **self.url_params,
+            "start_date": window_start.strftime("%Y-%m-%d"),
+            "end_date": window_end.strftime("%Y-%m-%d"),
+        }
+        metrics = self.get_selected_metrics()
+        if self.metrics_param and metrics:
+            params[self.metrics_param] = ",".join(metrics)
+        return params
+
+    def get_date_windows(
+        self, context: Optional[dict]
+    ) -> List[Tuple[datetime.date, datetime.date]]:
+        """Return the inclusive (start, end) date windows left to sync."""
+        windows = []
+        for date_range in self.get_date_ranges(context):
+            windows.extend(split_range(date_range, self.get_window_days()))
+        return windows
+
+    def get_window_days(self) -> int:
+        """Return the number of days covered by each request."""
+        return self.window_days or self.config.get("window_days", DEFAULT_WINDOW_DAYS)
+
+    def get_date_ranges(self, context: Optional[dict]) -> List[DateRange]:
+        """Return the date ranges to request, from the ranges already synced.
+
+        With `backfill_start_date`, only the backfill range is requested.
+        """
+        backfill_range = self.backfill_range
+        if backfill_range is not None:
+            return [backfill_range]
+        if "end_date" in self.config:
+            end_date = datetime.date.fromisoformat(self.config["end_date"][:10])
+        else:
+            end_date = datetime.date.today() - datetime.timedelta(days=1)
+        synced = self.get_synced_ranges(context)
+        if self.config.get("start_date"):
+            start_date = datetime.date.fromisoformat(self.config["start_date"][:10])
+        elif synced:
+            start_date = synced[0][0]
+        else:
+            raise ValueError(f"Stream '{self.name}' requires a `start_date`.")
+        return plan_ranges(
+            synced,
+            start_date,
+            end_date,
+            self.config.get("restatement_lookback_days", DEFAULT_LOOKBACK_DAYS),
+        )
+
+    def get_synced_ranges(self, context: Optional[dict]) -> List[DateRange]:
+        """Return the date ranges a brand has synced.
+
+        State written before ranges were recorded only has a bookmark, which
+        is taken to cover everything from `start_date`.
+        """
+        state = self.get_context_state(context)
+        if "synced_ranges" in state:
+            return ranges_from_state(state["synced_ranges"])
+        bookmark = state.get("replication_key_value")
+        if not bookmark:
+            return []
+        bookmark_date = datetime.date.fromisoformat(bookmark[:10])
+        start_date = bookmark_date
+        if self.config.get("start_date"):
+            start_date = min(
+                start_date, datetime.date.fromisoformat(self.config["start_date"][:10])
+            )
+        return [(start_date, bookmark_date)]
+
+    @property
+    def backfill_range(self) -> Optional[DateRange]:
+        """Return the configured backfill range, if any."""
+        if not self.config.get("backfill_start_date"):
+            return None
+        start_date = datetime.date.fromisoformat(
+            self.config["backfill_start_date"][:10]
+        )
+        end_date = datetime.date.fromisoformat(
+            self.config.get("backfill_end_date", self.config["backfill_start_date"])[
+                :10
+            ]
+        )
+        return start_date, end_date
+
+    def get_request_units(
+        self, context: Optional[dict]
+    ) -> List[Tuple[datetime.date, datetime.date]]:
+        """Return the date windows, each requested on its own."""
+        return self.get_date_windows(context)
+
+    def request_records(self, context: Optional[dict]) -> Iterable[dict]:
+        """Request each date window, yielding the windows' records in date order."""
+        if self.use_async_engine or self.replaying:
+            yield from super().request_records(context)
+            return
+
+        decorated_request = self.request_decorator(self._request)
+
+        def fetch_window(
+            window: Tuple[datetime.date, datetime.date],
+        ) -> Tuple[List[dict], int]:
+            prepared_request = self.prepare_request(context, next_page_token=window)
+            response = decorated_request(prepared_request, context)
+            self.update_sync_costs(prepared_request, response, context)
+            records = list(self.parse_timed(response, context))
+            return records, estimate_records_size(records)
+
+        windows = self.get_request_units(context)
+        concurrency = self.config.get("date_concurrency", DEFAULT_DATE_CONCURRENCY)
+        window_records = self.prefetch_pages(
+            ordered_map(fetch_window, windows, concurrency), lambda page: page[1]
+        )
+        for window, (records, _) in zip(windows, window_records):
+            yield from records
+            self._after_written(
+                functools.partial(self.on_unit_complete, context, window)
+            )
+
+    def parse_columns(self, response: requests.Response) -> Optional[Columns]:
+        """Return the response's rows as metric columns, if the stream has them.
+
+        Streams reshaping wide payloads into `date`, `metric_name` and
+        `metric_value` rows override this instead of `parse_response`. The
+        columns are turned into record dicts here, for every output mode.
+        """
+        return None
+
+    def parse_response(self, response: requests.Response) -> Iterable[dict]:
+        """Return records, built from `parse_columns` for long metric streams."""
+        columns = self.parse_columns(response)
+        if columns is None:
+            yield from super().parse_response(response)
+            return
+        yield from iter_metric_rows(columns)
+
+    def on_unit_complete(
+        self, context: Optional[dict], unit: Tuple[datetime.date, datetime.date]
+    ) -> None:
+        """Record a written date window as synced, checkpointing the bookmark.
+
+        The bookmark only moves forward, and not at all during a backfill.
+        """
+        with self.message_writer.lock:
+            state = self.get_context_state(context)
+            synced = self.get_synced_ranges(context)
+            state["synced_ranges"] = ranges_to_state(merge_ranges(synced + [unit]))
+            bookmark = state.get("replication_key_value")
+            if self.backfill_range is None and (
+                not bookmark or unit[1].isoformat() > bookmark[:10]
+            ):
+                state["replication_key"] = self.replication_key
+                state["replication_key_value"] = unit[1].isoformat()
+        self._write_state_message()
+
+    def _increment_stream_state(
+        self, latest_record: Dict[str, Any], *, context: Optional[dict] = None
+    ) -> None:
+        # Bookmarks advance per written window in `on_unit_complete`, as gaps and
+        # backfills request dates before the bookmark.
+        pass
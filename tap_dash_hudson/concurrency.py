@@ -0,0 +1,154 @@
+"""Bounded worker pool helpers for tap-dash-hudson."""
+
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import (
+    Callable,
+    Deque,
+    Generic,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def ordered_map(
+    func: Callable[[T], R],
+    items: Iterable[T],
+    max_workers: int,
+    executor_class: Callable[..., Executor] = ThreadPoolExecutor,
+) -> Iterator[R]:
+    """Map `func` over `items` with at most `max_workers` calls in flight.
+
+    Results are yielded in the order of `items`, whatever order they complete in,
+    so callers get deterministic output from a concurrent fan-out.
+    """
+    if max_workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    pending: Deque[Future] = deque()
+    with executor_class(max_workers=max_workers) as executor:
+        try:
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+class Prefetcher(Generic[T]):
+    """Iterate `items` on a background thread, ahead of the consumer.
+
+    At most `max_items` items are buffered, and the next one is only produced
+    while the buffered items' `get_size` total is under `max_bytes`, so a slow
+    consumer holds the producer back. Errors are raised once the items produced
+    before them have been consumed.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[T],
+        max_items: int,
+        max_bytes: int,
+        get_size: Callable[[T], int],
+    ) -> None:
+        """Initialize the prefetcher."""
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self._items = items
+        self._get_size = get_size
+        self._condition = threading.Condition()
+        self._buffered: Deque[Tuple[T, int]] = deque()
+        self._buffered_bytes = 0
+        self._finished = False
+        self._stopped = False
+        self._error: Optional[BaseException] = None
+
+    def start(self) -> "Prefetcher[T]":
+        """Start producing items, returning the prefetcher."""
+        threading.Thread(target=self._produce, name="prefetch", daemon=True).start()
+        return self
+
+    def close(self) -> None:
+        """Stop producing items."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def __iter__(self) -> Iterator[T]:
+        try:
+            while True:
+                with self._condition:
+                    while not self._buffered and not self._finished:
+                        self._condition.wait()
+                    if not self._buffered:
+                        break
+                    item, size = self._buffered.popleft()
+                    self._buffered_bytes -= size
+                    self._condition.notify_all()
+                yield item
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.close()
+
+    def _produce(self) -> None:
+        iterator = iter(self._items)
+        try:
+            while self._wait_for_space():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                size = self._get_size(item)
+                with self._condition:
+                    self._buffered.append((item, size))
+                    self._buffered_bytes += size
+                    self._condition.notify_all()
+        except BaseException as exc:
+            self._error = exc
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+            with self._condition:
+                self._finished = True
+                self._condition.notify_all()
+
+    def _wait_for_space(self) -> bool:
+        with self._condition:
+            # One item is always let through, so a zero budget cannot stall.
+            while (
+                not self._stopped
+                and self._buffered
+                and (
+                    len(self._buffered) >= self.max_items
+                    or self._buffered_bytes >= self.max_bytes
+                )
+            ):
+                self._condition.wait()
+            return not self._stopped
+
+
+def prefetch(
+    items: Iterable[T],
+    max_items: int,
+    max_bytes: int,
+    get_size: Callable[[T], int],
+) -> Iterator[T]:
+    """Return `items` from a started `Prefetcher`, or inline when `max_items` is 0."""
+    if max_items <= 0:
+        return iter(items)
+    return iter(Prefetcher(items, max_items, max_bytes, get_size).start())
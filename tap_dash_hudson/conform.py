@@ -0,0 +1,181 @@
+"""Record converters compiled once per stream schema."""
+
+import datetime
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set
+
+Converter = Callable[[Any], Any]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def _to_datetime_string(value: Any) -> Any:
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat() + "T00:00:00+00:00"
+    return value
+
+
+def _coerce_datetime_string(value: Any) -> Any:
+    # Dash Hudson labels days as `YYYY-MM-DD`, which is not an RFC 3339 date-time.
+    if isinstance(value, str) and len(value) == 10:
+        return value + "T00:00:00+00:00"
+    return _to_datetime_string(value)
+
+
+def _to_number(value: Any) -> Any:
+    if isinstance(value, str):
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return value
+    return value
+
+
+def _to_integer(value: Any) -> Any:
+    if isinstance(value, str) or isinstance(value, float) and value.is_integer():
+        try:
+            return int(value) if value != "" else None
+        except ValueError:
+            return value
+    return value
+
+
+def _to_boolean(value: Any) -> Any:
+    if value is None:
+        return None
+    return value != 0 and value != b"\x00"
+
+
+def _to_string(value: Any) -> Any:
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+def _types(schema: dict) -> List[str]:
+    types = schema.get("type", [])
+    return [types] if isinstance(types, str) else types
+
+
+def compile_converter(schema: dict, coerce: bool = False) -> Converter:
+    """Return a function converting one value of `schema` to its Singer type.
+
+    The schema is inspected here, once, so converting a value only runs the
+    checks its property needs. Like the SDK, only `datetime`/`date` objects and
+    booleans are converted by default; with `coerce`, strings are also parsed
+    into numbers, numbers formatted into strings, and `YYYY-MM-DD` days given a
+    midnight UTC time where the schema declares a date-time.
+    """
+    types = _types(schema)
+    if "object" in types and "properties" in schema:
+        return _compile_object_converter(schema["properties"], coerce)
+    if "array" in types and "items" in schema:
+        return _compile_array_converter(schema["items"], coerce)
+    if "boolean" in types:
+        return _to_boolean
+    if not coerce:
+        if schema.get("format") == "date-time":
+            return _to_datetime_string
+        return _identity
+    if "integer" in types:
+        return _to_integer
+    if "number" in types:
+        return _to_number
+    if schema.get("format") == "date-time":
+        return _coerce_datetime_string
+    if "string" in types:
+        return _to_string
+    return _identity
+
+
+def _compile_object_converter(properties: dict, coerce: bool) -> Converter:
+    converters = {
+        name: compile_converter(prop, coerce) for name, prop in properties.items()
+    }
+
+    def convert_object(value: Any) -> Any:
+        if not isinstance(value, dict):
+            return value
+        return {
+            key: converters[key](item) if key in converters else item
+            for key, item in value.items()
+        }
+
+    return convert_object
+
+
+def _compile_array_converter(items: dict, coerce: bool) -> Converter:
+    convert_item = compile_converter(items, coerce)
+    if convert_item is _identity:
+        return _identity
+
+    def convert_array(value: Any) -> Any:
+        if not isinstance(value, list):
+            return value
+        return [convert_item(item) for item in value]
+
+    return convert_array
+
+
+class RecordConformer:
+    """Conform records to a stream schema with converters compiled up front.
+
+    Stands in for the SDK's generic `conform_record_data_types`, which walks
+    the property schema of every field of every record. Properties missing
+    from the schema are dropped with a warning logged once per name. Values
+    keep their JSON types unless `coerce` is set, see `compile_converter`. When
+    `validate` is set, conformed records are also checked against the full
+    JSON schema, which is slow and only worth it for untrusted payloads.
+    """
+
+    def __init__(
+        self,
+        stream_name: str,
+        schema: dict,
+        logger: logging.Logger,
+        validate: bool = False,
+        coerce: bool = False,
+    ) -> None:
+        """Initialize the conformer."""
+        self.stream_name = stream_name
+        self.logger = logger
+        self.converters: Dict[str, Converter] = {
+            name: compile_converter(prop, coerce)
+            for name, prop in schema["properties"].items()
+        }
+        self._warned: Set[str] = set()
+        self._validator: Optional[Any] = None
+        if validate:
+            from jsonschema import Draft4Validator
+
+            self._validator = Draft4Validator(schema)
+
+    def conform(self, record: dict) -> dict:
+        """Return a converted copy of `record`."""
+        converters = self.converters
+        result = {}
+        for name, value in record.items():
+            converter = converters.get(name)
+            if converter is None:
+                self._warn_unmapped(name)
+                continue
+            result[name] = converter(value)
+        if self._validator is not None:
+            self._validator.validate(result)
+        return result
+
+    def _warn_unmapped(self, name: str) -> None:
+        if name not in self._warned:
+            self._warned.add(name)
+            self.logger.warning(
+                f"Property '{name}' was present in the '{self.stream_name}' stream "
+                "but not found in catalog schema. Ignoring."
+            )
@@ -1,23 +1,30 @@
-"""Stream type classes for tap-dash-hudson
-from the Facebook backend, docs https://facebook.dashhudson.com/docs."""
-import datetime
-from typing import Any, Dict, Optional, Iterable
+"""Stream type classes for tap-dash-hudson from the Facebook backend.
+
+Docs: https://facebook.dashhudson.com/docs.
+"""
+
+from typing import Iterable
 
 import requests
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
-from tap_dash_hudson.client import DashHudsonStream
+from tap_dash_hudson.client import DashHudsonStream, DashHudsonTimeseriesStream
 
 
 class FacebookBackendStream(DashHudsonStream):
-    service = 'facebook'
+    """Base class for streams of the Facebook backend."""
+
+    service = "facebook"
 
 
 class FacebookBusinessesStream(FacebookBackendStream):
+    """Facebook businesses of a brand."""
+
     name = "facebook_businesses"
     path = "/brands/{brand_id}/fb_businesses"
     primary_keys = ["id"]
-    replication_key = None
+    replication_key = None  # type: ignore[override]
+    cacheable = True
     schema = th.PropertiesList(
         th.Property("id", th.StringType),
         th.Property("name", th.StringType),
@@ -25,11 +32,14 @@ class FacebookBusinessesStream(FacebookBackendStream):
     ).to_dict()
 
 
-class FacebookPageMetricsStream(FacebookBackendStream):
+class FacebookPageMetricsStream(FacebookBackendStream, DashHudsonTimeseriesStream):
+    """Daily Facebook page metrics of a brand."""
+
     name = "facebook_page_metrics"
     path = "/brands/{brand_id}/page/metrics"
     primary_keys = ["brand_id", "date"]
     replication_key = "date"
+    metrics_param = "metrics"
     schema = th.PropertiesList(
         th.Property("brand_id", th.NumberType),
         th.Property("date", th.DateTimeType),
@@ -44,22 +54,8 @@ class FacebookPageMetricsStream(FacebookBackendStream):
         th.Property("total_fans", th.NumberType),
     ).to_dict()
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        start_date = self.get_starting_timestamp(context)
-        params: dict = {
-            "scale": "DAILY",
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": self.config.get("end_date", (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")),
-        }
-        return params
-
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["brand_id"] = self.config["brand_id"]
-        return row
-
     def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        rows = response.json()['timeseries_metrics']
+        """Yield one row per day with its selected metrics."""
+        rows = self.response_json(response)["timeseries_metrics"]
         for row in rows:
-            yield dict(**{"date": row['timestamp']}, **row['metrics'])
+            yield {"date": row["timestamp"], **self.select_fields(row["metrics"])}
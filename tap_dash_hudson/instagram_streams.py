@@ -1,21 +1,30 @@
-"""Stream type classes for tap-dash-hudson
-from the Instagram backend, docs https://instagram-backend.dashhudson.com/docs."""
-import datetime
-from typing import Any, Dict, Optional, Iterable
-from urllib.parse import urlparse
-from urllib.parse import parse_qs
+"""Stream type classes for tap-dash-hudson from the Instagram backend.
+
+Docs: https://instagram-backend.dashhudson.com/docs.
+"""
+
+from typing import Any, Dict, Iterable, Optional, cast
+from urllib.parse import parse_qs, urlparse
 
 import requests
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
-from tap_dash_hudson.client import DashHudsonStream
+from tap_dash_hudson.client import DashHudsonStream, DashHudsonTimeseriesStream
+from tap_dash_hudson.planner import DateRange
+from tap_dash_hudson.transform import Columns, unpivot_series
 
 
 class InstagramBackendStream(DashHudsonStream):
-    service = 'instagram-backend'
+    """Base class for streams of the Instagram backend."""
+
+    service = "instagram-backend"
 
 
-class InstagramDailyBrandUserInsightsStream(InstagramBackendStream):
+class InstagramDailyBrandUserInsightsStream(
+    InstagramBackendStream, DashHudsonTimeseriesStream
+):
+    """Daily Instagram user insights of a brand."""
+
     name = "instagram_daily_brand_user_insights"
     path = "/brands/{brand_id}/brand_user_insights"
     primary_keys = ["brand_id", "date", "metric_name"]
@@ -27,33 +36,16 @@ class InstagramDailyBrandUserInsightsStream(InstagramBackendStream):
         th.Property("metric_value", th.NumberType),
     ).to_dict()
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        start_date = self.get_starting_timestamp(context)
-        params: dict = {
-            "scale": "DAILY",
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": self.config.get("end_date", (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")),
-        }
-        return params
-
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["brand_id"] = self.config["brand_id"]
-        return row
+    def parse_columns(self, response: requests.Response) -> Columns:
+        """Return the response series unpivoted into columns."""
+        return unpivot_series(self.response_json(response))
 
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        row = response.json()
-        for metric_name in row.keys():
-            for label, value in zip(row[metric_name]["labels"], row[metric_name]["values"]):
-                yield {
-                    "date": label,
-                    "metric_name": metric_name,
-                    "metric_value": value,
-                }
 
+class InstagramDailyFollowersLostInsightsStream(
+    InstagramBackendStream, DashHudsonTimeseriesStream
+):
+    """Daily Instagram followers lost of a brand."""
 
-class InstagramDailyFollowersLostInsightsStream(InstagramBackendStream):
     name = "instagram_daily_followers_lost_insights"
     path = "/brands/{brand_id}/followers_lost_insights"
     primary_keys = ["brand_id", "date", "metric_name"]
@@ -65,33 +57,16 @@ class InstagramDailyFollowersLostInsightsStream(InstagramBackendStream):
         th.Property("metric_value", th.NumberType),
     ).to_dict()
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        start_date = self.get_starting_timestamp(context)
-        params: dict = {
-            "scale": "DAILY",
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": self.config.get("end_date", (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")),
-        }
-        return params
-
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["brand_id"] = self.config["brand_id"]
-        return row
+    def parse_columns(self, response: requests.Response) -> Columns:
+        """Return the response series unpivoted into columns."""
+        return unpivot_series(self.response_json(response))
 
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        row = response.json()
-        for metric_name in row.keys():
-            for label, value in zip(row[metric_name]["labels"], row[metric_name]["values"]):
-                yield {
-                    "date": label,
-                    "metric_name": metric_name,
-                    "metric_value": value,
-                }
 
+class InstagramDailyFollowersDemographicsStream(
+    InstagramBackendStream, DashHudsonTimeseriesStream
+):
+    """Daily Instagram follower demographics of a brand."""
 
-class InstagramDailyFollowersDemographicsStream(InstagramBackendStream):
     name = "instagram_daily_followers_demographics"
     path = "/brands/{brand_id}/followers_demographics"
     primary_keys = ["brand_id", "date", "metric_name", "metric_sub_name"]
@@ -104,38 +79,27 @@ class InstagramDailyFollowersDemographicsStream(InstagramBackendStream):
         th.Property("metric_value", th.NumberType),
     ).to_dict()
 
+    # Days are requested in order, so the bookmark only moves past completed days.
+    is_sorted = True
+    window_days = 1
+
     def get_url_params(
         self, context: Optional[dict], next_page_token: Optional[Any]
     ) -> Dict[str, Any]:
-        if next_page_token is not None:
-            start_date = next_page_token
-        else:
-            start_date = self.get_starting_timestamp(context)
+        """Return the query parameters for one day."""
+        day, _ = cast(DateRange, next_page_token)
         params: dict = {
-            "date": start_date.strftime("%Y-%m-%d"),
+            "date": day.strftime("%Y-%m-%d"),
         }
         return params
 
-    def get_next_page_token(
-        self, response: requests.Response, previous_token: Optional[Any]
-    ) -> Optional[Any]:
-        yesterday = datetime.datetime.today() - datetime.timedelta(days=1)
-        start_date = datetime.datetime.strptime(parse_qs(urlparse(response.request.url).query)['date'][0], "%Y-%m-%d")
-        next_date = start_date + datetime.timedelta(days=1)
-        if next_date < yesterday:
-            return next_date
-        return None
-
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["brand_id"] = self.config["brand_id"]
-        return row
-
     def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        row = response.json()
-        date = parse_qs(urlparse(response.request.url).query)['date'][0]
+        """Yield one row per metric category of the requested day."""
+        row = self.response_json(response)
+        date = parse_qs(urlparse(str(response.request.url)).query)["date"][0]
         for metric_name in row.keys():
             for category, value in row[metric_name].items():
-                if type(value) == dict:
+                if isinstance(value, dict):
                     for k, v in value.items():
                         yield {
                             "date": date,
@@ -152,7 +116,11 @@ class InstagramDailyFollowersDemographicsStream(InstagramBackendStream):
                     }
 
 
-class InstagramDailyFollowersInsightsStream(InstagramBackendStream):
+class InstagramDailyFollowersInsightsStream(
+    InstagramBackendStream, DashHudsonTimeseriesStream
+):
+    """Daily Instagram follower insights of a brand."""
+
     name = "instagram_daily_followers_insights"
     path = "/brands/{brand_id}/followers_insights"
     primary_keys = ["brand_id", "date", "metric_name"]
@@ -164,39 +132,24 @@ class InstagramDailyFollowersInsightsStream(InstagramBackendStream):
         th.Property("metric_value", th.NumberType),
     ).to_dict()
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        start_date = self.get_starting_timestamp(context)
-        params: dict = {
-            "fill_empty": False,
-            "scale": "DAILY",
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": self.config.get("end_date", (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")),
-        }
-        return params
-
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["brand_id"] = self.config["brand_id"]
-        return row
+    url_params = {"fill_empty": False, "scale": "DAILY"}
 
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        row = response.json()
-        for metric_name in row.keys():
-            for label, value in zip(row[metric_name]["labels"], row[metric_name]["values"]):
-                yield {
-                    "date": label,
-                    "metric_name": metric_name,
-                    "metric_value": value,
-                }
+    def parse_columns(self, response: requests.Response) -> Columns:
+        """Return the response series unpivoted into columns."""
+        return unpivot_series(self.response_json(response))
 
 
 class InstagramRelationshipsStream(InstagramBackendStream):
+    """Instagram relationships of a brand."""
+
     name = "instagram_relationships"
     path = "/brands/{brand_id}/instagram/relationships"
     primary_keys = ["brand_id", "id"]
     records_jsonpath = "$.data[*]"
-    replication_key = None
+    supports_streaming = True
+    replication_key = None  # type: ignore[override]
+    cacheable = True
+    resumable_pages = True
     schema = th.PropertiesList(
         th.Property("brand_id", th.NumberType),
         th.Property("acceptance_status", th.StringType),
@@ -249,43 +202,46 @@ class InstagramRelationshipsStream(InstagramBackendStream):
         th.Property("story_avg_impressions", th.NumberType),
         th.Property("story_avg_reach", th.NumberType),
         th.Property("story_total_posts", th.NumberType),
-        th.Property("tags", th.ArrayType(
-            th.ObjectType(
-                th.Property("id", th.NumberType),
-                th.Property("color", th.StringType),
-                th.Property("name", th.StringType),
-            )
-        )),
+        th.Property(
+            "tags",
+            th.ArrayType(
+                th.ObjectType(
+                    th.Property("id", th.NumberType),
+                    th.Property("color", th.StringType),
+                    th.Property("name", th.StringType),
+                )
+            ),
+        ),
         th.Property("total_emv", th.NumberType),
         th.Property("total_followers_gained", th.NumberType),
         th.Property("total_posts", th.NumberType),
-        th.Property("user", th.ObjectType(
-            th.Property("avg_effectiveness", th.NumberType),
-            th.Property("avg_engagement", th.NumberType),
-            th.Property("avg_likes", th.NumberType),
-            th.Property("avg_posts_weekly", th.NumberType),
-            th.Property("avg_reach", th.NumberType),
-            th.Property("avg_total_engagement", th.NumberType),
-            th.Property("bio", th.StringType),
-            th.Property("bio_url", th.StringType),
-            th.Property("followers", th.NumberType),
-            th.Property("following", th.NumberType),
-            th.Property("handle", th.StringType),
-            th.Property("instagram_id", th.NumberType),
-            th.Property("is_business", th.NumberType),
-        )),
+        th.Property(
+            "user",
+            th.ObjectType(
+                th.Property("avg_effectiveness", th.NumberType),
+                th.Property("avg_engagement", th.NumberType),
+                th.Property("avg_likes", th.NumberType),
+                th.Property("avg_posts_weekly", th.NumberType),
+                th.Property("avg_reach", th.NumberType),
+                th.Property("avg_total_engagement", th.NumberType),
+                th.Property("bio", th.StringType),
+                th.Property("bio_url", th.StringType),
+                th.Property("followers", th.NumberType),
+                th.Property("following", th.NumberType),
+                th.Property("handle", th.StringType),
+                th.Property("instagram_id", th.NumberType),
+                th.Property("is_business", th.NumberType),
+            ),
+        ),
     ).to_dict()
 
     def get_url_params(
         self, context: Optional[dict], next_page_token: Optional[Any]
     ) -> Dict[str, Any]:
+        """Return the query parameters for one page."""
         params: dict = {
-            'all_relationships': True,
+            "all_relationships": True,
         }
         if next_page_token is not None:
-            params['offset'] = parse_qs(urlparse(next_page_token).query)['offset'][0]
+            params["offset"] = parse_qs(urlparse(next_page_token).query)["offset"][0]
         return params
-
-    def post_process(self, row: dict, context: Optional[dict] = None) -> Optional[dict]:
-        row["brand_id"] = self.config["brand_id"]
-        return row
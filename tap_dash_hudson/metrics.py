@@ -0,0 +1,228 @@
+"""Performance instrumentation of tap runs."""
+
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, Iterator, List, Tuple, TypeVar
+
+T = TypeVar("T")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+# Interface the metrics server listens on unless `metrics_host` is set.
+DEFAULT_METRICS_HOST = "127.0.0.1"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def to_labels(**labels: Any) -> Labels:
+    """Return hashable labels, dropping those without a value."""
+    return tuple(
+        sorted(
+            (name, str(value)) for name, value in labels.items() if value is not None
+        )
+    )
+
+
+class Histogram:
+    """Cumulative histogram of observed values."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Initialize the histogram."""
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Add one observation."""
+        self.sum += value
+        self.count += 1
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+
+    def cumulative_counts(self) -> List[int]:
+        """Return the number of observations at or below each bucket bound."""
+        total, counts = 0, []
+        for count in self.counts:
+            total += count
+            counts.append(total)
+        return counts
+
+
+class MetricsRegistry:
+    """Counters and histograms labelled by service, stream and brand.
+
+    Counter names ending in `_seconds_total` accumulate time, such as the time
+    spent in each pipeline stage.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, labels: Labels, value: float = 1) -> None:
+        """Add `value` to a counter."""
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        """Add an observation to a histogram."""
+        key = (name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    def timed(self, iterable: Iterable[T], name: str, labels: Labels) -> Iterator[T]:
+        """Yield from `iterable`, adding the time spent producing items to `name`."""
+        iterator = iter(iterable)
+        elapsed = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    elapsed += time.perf_counter() - started
+                    return
+                elapsed += time.perf_counter() - started
+                yield item
+        finally:
+            self.add(name, labels, elapsed)
+
+    def merge(self, summary: dict) -> None:
+        """Add the series of another registry's `summary`, such as a worker's."""
+        for counter in summary["counters"]:
+            self.add(
+                counter["metric"], to_labels(**counter["labels"]), counter["value"]
+            )
+        with self._lock:
+            for item in summary["histograms"]:
+                key = (item["metric"], to_labels(**item["labels"]))
+                histogram = self.histograms.setdefault(key, Histogram())
+                previous = 0
+                for index, count in enumerate(item["buckets"].values()):
+                    # Summaries hold cumulative counts.
+                    histogram.counts[index] += count - previous
+                    previous = count
+                histogram.sum += item["sum"]
+                histogram.count += item["count"]
+
+    def get_counters(self, **labels: Any) -> Dict[str, float]:
+        """Return counter totals by name over the series matching `labels`."""
+        wanted = set(to_labels(**labels))
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for (name, series), value in self.counters.items():
+                if wanted <= set(series):
+                    totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def summary(self) -> dict:
+        """Return every series as a JSON-serializable summary."""
+        with self._lock:
+            return {
+                "started": self.started,
+                "finished": time.time(),
+                "counters": [
+                    {"metric": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                "histograms": [
+                    {
+                        "metric": name,
+                        "labels": dict(labels),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": {
+                            str(bound): count
+                            for bound, count in zip(
+                                histogram.buckets, histogram.cumulative_counts()
+                            )
+                        },
+                    }
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+            }
+
+    def to_prometheus(self) -> str:
+        """Return every series in the Prometheus text exposition format."""
+        lines: List[str] = []
+        summary = self.summary()
+        for counter in summary["counters"]:
+            name = f"tap_dash_hudson_{counter['metric']}"
+            lines.append(
+                f"{name}{_format_labels(counter['labels'])} {counter['value']}"
+            )
+        for histogram in summary["histograms"]:
+            name = f"tap_dash_hudson_{histogram['metric']}"
+            for bound, count in histogram["buckets"].items():
+                le = "+Inf" if bound == "inf" else bound
+                labels = _format_labels({**histogram["labels"], "le": le})
+                lines.append(f"{name}_bucket{labels} {count}")
+            labels = _format_labels(histogram["labels"])
+            lines.append(f"{name}_sum{labels} {histogram['sum']}")
+            lines.append(f"{name}_count{labels} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str) -> None:
+        """Write the summary to a JSON file."""
+        _write_atomic(path, json.dumps(self.summary(), indent=2))
+
+    def write_prometheus(self, path: str) -> None:
+        """Write a Prometheus textfile, for node_exporter's textfile collector."""
+        _write_atomic(path, self.to_prometheus())
+
+    def serve_prometheus(
+        self, port: int, host: str = DEFAULT_METRICS_HOST
+    ) -> ThreadingHTTPServer:
+        """Serve the Prometheus text format on `/metrics` from a background thread.
+
+        Only local clients can connect by default. Set `host` to "0.0.0.0" to
+        let a Prometheus server on another host scrape the tap.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = registry.to_prometheus().encode()
+                self.send_response(200 if self.path == "/metrics" else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in sorted(labels.items())
+    )
+    return "{" + pairs + "}"
+
+
+def _write_atomic(path: str, content: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as output:
+        output.write(content)
+    os.replace(tmp_path, path)
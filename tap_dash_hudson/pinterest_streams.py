@@ -1,23 +1,29 @@
-"""Stream type classes for tap-dash-hudson
-from the Pinterest backend, docs https://pinterest.dashhudson.com/docs."""
-import datetime
-from typing import Any, Dict, Optional, Iterable
+"""Stream type classes for tap-dash-hudson from the Pinterest backend.
+
+Docs: https://pinterest.dashhudson.com/docs.
+"""
 
 import requests
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
-from tap_dash_hudson.client import DashHudsonStream
+from tap_dash_hudson.client import DashHudsonStream, DashHudsonTimeseriesStream
+from tap_dash_hudson.transform import Columns, unpivot_mapping
 
 
 class PinterestBackendStream(DashHudsonStream):
-    service = 'pinterest'
+    """Base class for streams of the Pinterest backend."""
+
+    service = "pinterest"
 
 
 class PinterestAccountStream(PinterestBackendStream):
+    """Pinterest account of a brand."""
+
     name = "pinterest_account"
     path = "/brands/{brand_id}/account"
     primary_keys = ["pinterest_account_id"]
-    replication_key = None
+    replication_key = None  # type: ignore[override]
+    cacheable = True
     schema = th.PropertiesList(
         th.Property("id", th.NumberType),
         th.Property("avatar_url", th.StringType),
@@ -37,7 +43,9 @@ class PinterestAccountStream(PinterestBackendStream):
     ).to_dict()
 
 
-class PinterestAccountStatsStream(PinterestBackendStream):
+class PinterestAccountStatsStream(PinterestBackendStream, DashHudsonTimeseriesStream):
+    """Daily Pinterest account stats of a brand."""
+
     name = "pinterest_account_stats"
     path = "/brands/{brand_id}/account/stats"
     primary_keys = ["brand_id", "date", "metric_name"]
@@ -49,23 +57,6 @@ class PinterestAccountStatsStream(PinterestBackendStream):
         th.Property("metric_value", th.NumberType),
     ).to_dict()
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        start_date = self.get_starting_timestamp(context)
-        params: dict = {
-            "scale": "DAILY",
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": self.config.get("end_date", (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")),
-        }
-        return params
-
-    def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        response_json = response.json()
-        for date, metrics in response_json.items():
-            for metric_name, metric_value in metrics.items():
-                yield {
-                    "date": date,
-                    "metric_name": metric_name,
-                    "metric_value": metric_value,
-                }
+    def parse_columns(self, response: requests.Response) -> Columns:
+        """Return the response unpivoted into columns."""
+        return unpivot_mapping(self.response_json(response))
@@ -0,0 +1,85 @@
+"""Planning of the date ranges timeseries streams request."""
+
+import datetime
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_LOOKBACK_DAYS = 1
+
+# Inclusive (start, end) dates.
+DateRange = Tuple[datetime.date, datetime.date]
+
+_DAY = datetime.timedelta(days=1)
+
+
+def merge_ranges(ranges: Iterable[DateRange]) -> List[DateRange]:
+    """Return `ranges` in date order, joining those that overlap or touch."""
+    merged: List[DateRange] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + _DAY:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def get_gaps(
+    synced: List[DateRange], start: datetime.date, end: datetime.date
+) -> List[DateRange]:
+    """Return the parts of `start` to `end` not covered by `synced`."""
+    gaps = []
+    for synced_start, synced_end in merge_ranges(synced):
+        if synced_end < start:
+            continue
+        if synced_start > end:
+            break
+        if synced_start > start:
+            gaps.append((start, synced_start - _DAY))
+        start = synced_end + _DAY
+    if start <= end:
+        gaps.append((start, end))
+    return gaps
+
+
+def plan_ranges(
+    synced: List[DateRange],
+    start: datetime.date,
+    end: datetime.date,
+    lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+) -> List[DateRange]:
+    """Return the ranges to request between `start` and `end`.
+
+    Those are the gaps in `synced`, plus the last `lookback_days` days synced,
+    which the API may have restated since.
+    """
+    ranges = get_gaps(synced, start, end)
+    merged = merge_ranges(synced)
+    if merged and lookback_days > 0:
+        last_synced = min(merged[-1][1], end)
+        lookback_start = max(start, last_synced - (lookback_days - 1) * _DAY)
+        if lookback_start <= last_synced:
+            ranges.append((lookback_start, last_synced))
+    return merge_ranges(ranges)
+
+
+def split_range(date_range: DateRange, window_days: int) -> List[DateRange]:
+    """Return `date_range` as consecutive windows of at most `window_days` days."""
+    start, end = date_range
+    windows = []
+    while start <= end:
+        window_end = min(start + (window_days - 1) * _DAY, end)
+        windows.append((start, window_end))
+        start = window_end + _DAY
+    return windows
+
+
+def ranges_from_state(value: Optional[List[List[str]]]) -> List[DateRange]:
+    """Return the ranges stored in a partition's state."""
+    return [
+        (datetime.date.fromisoformat(start), datetime.date.fromisoformat(end))
+        for start, end in value or []
+    ]
+
+
+def ranges_to_state(ranges: List[DateRange]) -> List[List[str]]:
+    """Return ranges as stored in a partition's state."""
+    return [[start.isoformat(), end.isoformat()] for start, end in ranges]
@@ -0,0 +1,96 @@
+"""Lazy registry of the tap's streams and on-disk cache of its catalog."""
+
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+from typing import Any, Dict, List, Optional, Type
+
+from singer_sdk import Stream
+from singer_sdk.helpers._singer import Catalog
+
+# Stream name to the module and class defining it, so a stream module is only
+# imported, and its schemas only built, when one of its streams is synced.
+STREAM_CLASSES: Dict[str, str] = {
+    "facebook_businesses": "tap_dash_hudson.facebook_streams:FacebookBusinessesStream",
+    "facebook_page_metrics": (
+        "tap_dash_hudson.facebook_streams:FacebookPageMetricsStream"
+    ),
+    "instagram_daily_brand_user_insights": (
+        "tap_dash_hudson.instagram_streams:InstagramDailyBrandUserInsightsStream"
+    ),
+    "instagram_daily_followers_lost_insights": (
+        "tap_dash_hudson.instagram_streams:InstagramDailyFollowersLostInsightsStream"
+    ),
+    "instagram_daily_followers_demographics": (
+        "tap_dash_hudson.instagram_streams:InstagramDailyFollowersDemographicsStream"
+    ),
+    "instagram_daily_followers_insights": (
+        "tap_dash_hudson.instagram_streams:InstagramDailyFollowersInsightsStream"
+    ),
+    "instagram_relationships": (
+        "tap_dash_hudson.instagram_streams:InstagramRelationshipsStream"
+    ),
+    "pinterest_account": "tap_dash_hudson.pinterest_streams:PinterestAccountStream",
+    "pinterest_account_stats": (
+        "tap_dash_hudson.pinterest_streams:PinterestAccountStatsStream"
+    ),
+    "twitter_account": "tap_dash_hudson.twitter_streams:TwitterAccountStream",
+    "twitter_metrics": "tap_dash_hudson.twitter_streams:TwitterMetricsStream",
+}
+
+
+def get_stream_class(name: str) -> Type[Stream]:
+    """Import and return the class of a registered stream."""
+    module_name, class_name = STREAM_CLASSES[name].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_selected_stream_names(catalog: Optional[Catalog]) -> List[str]:
+    """Return the registered streams selected in `catalog`, or all without one.
+
+    Streams missing from the catalog count as selected, as they do in the SDK.
+    """
+    names = []
+    for name in STREAM_CLASSES:
+        entry = catalog.get_stream(name) if catalog is not None else None
+        if entry is None or entry.metadata.resolve_selection().get((), True):
+            names.append(name)
+    return names
+
+
+def get_catalog_fingerprint(config: dict, version: str) -> str:
+    """Return a fingerprint of everything the discovered catalog depends on.
+
+    That is the tap version, its config and the stream modules' source files,
+    so editing a schema in a development install also invalidates the cache.
+    """
+    parts: List[Any] = [version, config]
+    for module_name in sorted({path.split(":")[0] for path in STREAM_CLASSES.values()}):
+        spec = importlib.util.find_spec(module_name)
+        if spec is not None and spec.origin:
+            stat = os.stat(spec.origin)
+            parts.append([module_name, stat.st_mtime_ns, stat.st_size])
+    content = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def read_cached_catalog(path: str, fingerprint: str) -> Optional[dict]:
+    """Return the catalog cached at `path`, unless missing or stale."""
+    try:
+        with open(path) as cache_file:
+            cached = json.load(cache_file)
+    except (OSError, ValueError):
+        return None
+    if cached.get("fingerprint") != fingerprint:
+        return None
+    return cached["catalog"]
+
+
+def write_cached_catalog(path: str, fingerprint: str, catalog: dict) -> None:
+    """Cache a discovered catalog at `path`."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as cache_file:
+        json.dump({"fingerprint": fingerprint, "catalog": catalog}, cache_file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,100 @@
+"""Pooled HTTP sessions shared by the streams of a tap run."""
+
+import importlib
+import io
+from types import ModuleType
+from typing import Any, Optional
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+httpx: Optional[ModuleType]
+try:
+    httpx = importlib.import_module("httpx")
+except ImportError:  # httpx is only needed for HTTP/2
+    httpx = None
+
+DEFAULT_POOL_SIZE = 10
+
+
+def to_httpx_headers(request: requests.PreparedRequest) -> dict:
+    """Return a request's headers for httpx, which negotiates its own encodings."""
+    headers = dict(request.headers)
+    if headers.get("Accept-Encoding") != "identity":
+        headers.pop("Accept-Encoding", None)
+    return headers
+
+
+def to_requests_response(
+    httpx_response: Any, request: requests.PreparedRequest
+) -> requests.Response:
+    """Convert an `httpx.Response` so the stream hooks can consume it unchanged."""
+    response = requests.Response()
+    response.status_code = httpx_response.status_code
+    response.headers = CaseInsensitiveDict(httpx_response.headers)
+    response._content = httpx_response.content
+    response.raw = io.BytesIO(httpx_response.content)
+    response.url = str(httpx_response.url)
+    response.reason = httpx_response.reason_phrase
+    response.encoding = httpx_response.encoding
+    response.elapsed = httpx_response.elapsed
+    response.request = request
+    return response
+
+
+class HTTPXAdapter(BaseAdapter):
+    """Transport adapter sending `requests` calls through an HTTP/2 httpx client."""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, keep_alive: bool = True):
+        """Initialize the adapter."""
+        super().__init__()
+        if httpx is None:
+            raise ImportError("HTTP/2 support requires the `httpx[http2]` package.")
+        self.client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size if keep_alive else 0,
+            ),
+        )
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout: Optional[Any] = None,
+        verify: Any = True,
+        cert: Any = None,
+        proxies: Any = None,
+    ) -> requests.Response:
+        """Send a prepared request over the httpx client."""
+        httpx_response = self.client.request(
+            request.method or "GET",
+            request.url or "",
+            headers=to_httpx_headers(request),
+            content=request.body,
+            timeout=timeout,
+        )
+        return to_requests_response(httpx_response, request)
+
+    def close(self) -> None:
+        """Close the underlying httpx connection pool."""
+        self.client.close()
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE, keep_alive: bool = True, http2: bool = False
+) -> requests.Session:
+    """Return a session with a connection pool of `pool_size` for one backend host."""
+    session = requests.Session()
+    adapter: BaseAdapter
+    if http2:
+        adapter = HTTPXAdapter(pool_size=pool_size, keep_alive=keep_alive)
+    else:
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
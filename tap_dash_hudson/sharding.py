@@ -0,0 +1,273 @@
+"""Multi-process syncs sharded by stream, brand and date range."""
+
+import datetime
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    cast,
+)
+
+from tap_dash_hudson.client import (
+    DashHudsonStream,
+    DashHudsonTimeseriesStream,
+    get_brand_ids,
+)
+from tap_dash_hudson.planner import (
+    merge_ranges,
+    ranges_from_state,
+    ranges_to_state,
+    split_range,
+)
+from tap_dash_hudson.writer import get_message_type
+
+if TYPE_CHECKING:
+    from tap_dash_hudson.tap import TapDashHudson
+
+DEFAULT_SHARD_DAYS = 90
+
+
+class Shard(NamedTuple):
+    """One stream and brand, over an inclusive date range for timeseries streams."""
+
+    stream: str
+    brand_id: Any
+    start_date: Optional[datetime.date] = None
+    end_date: Optional[datetime.date] = None
+
+
+def get_partition_state(state: dict, stream_name: str, brand_id: Any) -> dict:
+    """Return the state of one brand partition of a stream, empty if missing."""
+    stream_state = state.get("bookmarks", {}).get(stream_name, {})
+    for partition in stream_state.get("partitions", []):
+        if partition.get("context") == {"brand_id": brand_id}:
+            return partition
+    return {}
+
+
+def run_shard(
+    config: dict, catalog: Optional[dict], state: dict, shard: Shard, output_path: str
+) -> Tuple[dict, dict]:
+    """Sync one shard, writing its messages to `output_path`.
+
+    Returns the shard's final state and a summary of its metrics.
+    """
+    from tap_dash_hudson.tap import TapDashHudson
+
+    shard_config: Dict[str, Any] = {**config, "brand_ids": [shard.brand_id]}
+    # Output goes through the coordinator.
+    shard_config.pop("output_path", None)
+    shard_config.pop("output_compression", None)
+    if shard.start_date is not None and shard.end_date is not None:
+        shard_config["start_date"] = shard.start_date.isoformat()
+        shard_config["end_date"] = shard.end_date.isoformat()
+        shard_config.pop("backfill_start_date", None)
+        shard_config.pop("backfill_end_date", None)
+        # The range is set by the coordinator, so bookmarks must not narrow it.
+        state = {}
+    stdout = sys.stdout
+    with open(output_path, "w") as output:
+        sys.stdout = output
+        try:
+            tap = TapDashHudson(
+                config=shard_config,
+                catalog=catalog,
+                state=state,
+                parse_env_config=False,
+            )
+            tap._reset_state_progress_markers()
+            stream = tap.streams[shard.stream]
+            stream.sync()
+            stream.finalize_state_progress_markers()
+            tap.message_writer.flush()
+        finally:
+            sys.stdout = stdout
+    return tap.state, tap.metrics.summary()
+
+
+class ShardCoordinator:
+    """Sync a tap's selected streams as shards on a pool of processes.
+
+    Parsing is CPU bound, so a single process stops scaling with the number
+    of brands. Each shard runs the usual stream classes in a worker process,
+    writing to a file which the coordinator relays to STDOUT once the shard is
+    done, keeping one SCHEMA per stream and dropping the shard's STATE.
+
+    The planned date ranges of timeseries streams are split into shards of
+    about `shard_days` days along their date windows. The coordinator emits its
+    own STATE after every shard, adding the shard's dates to its brand's synced
+    ranges. A brand's bookmark only moves to the end of the last shard of an
+    unbroken run of completed shards from its start, so the state stays
+    consistent if a later shard fails.
+    """
+
+    def __init__(
+        self,
+        tap: "TapDashHudson",
+        processes: int,
+        shard_days: int = DEFAULT_SHARD_DAYS,
+    ) -> None:
+        """Initialize the coordinator."""
+        self.tap = tap
+        self.processes = processes
+        self.shard_days = shard_days
+        self._streams: Dict[str, DashHudsonStream] = {}
+        self._schemas_sent: Set[str] = set()
+        # Shards of each stream and brand, in the order bookmarks advance over them.
+        self._brand_shards: Dict[Tuple[str, Any], List[Shard]] = {}
+        self._completed: Set[Shard] = set()
+
+    def get_shards(self) -> List[Shard]:
+        """Return the shards of every selected stream, brand by brand."""
+        shards = []
+        for tap_stream in self.tap.streams.values():
+            if not tap_stream.selected or tap_stream.parent_stream_type:
+                continue
+            stream = cast(DashHudsonStream, tap_stream)
+            self._streams[stream.name] = stream
+            for brand_id in get_brand_ids(stream.config):
+                # Replays parse every archived response, there are no dates to split.
+                if (
+                    not isinstance(stream, DashHudsonTimeseriesStream)
+                    or stream.replaying
+                ):
+                    shards.append(Shard(stream.name, brand_id))
+                    continue
+                # Shards never span dates between planned ranges, which are synced.
+                context = {"brand_id": brand_id}
+                for range_start, range_end in stream.get_date_ranges(context):
+                    shard_start = None
+                    for window_start, window_end in split_range(
+                        (range_start, range_end), stream.get_window_days()
+                    ):
+                        if shard_start is None:
+                            shard_start = window_start
+                        if (window_end - shard_start).days + 1 >= self.shard_days:
+                            shards.append(
+                                Shard(stream.name, brand_id, shard_start, window_end)
+                            )
+                            shard_start = None
+                    if shard_start is not None:
+                        shards.append(
+                            Shard(stream.name, brand_id, shard_start, range_end)
+                        )
+        return shards
+
+    def run(self) -> None:
+        """Sync every shard, then write the merged STATE."""
+        shards = self.get_shards()
+        config = dict(self.tap.config)
+        catalog = self.tap.input_catalog.to_dict() if self.tap.input_catalog else None
+        for shard in shards:
+            brand_key = (shard.stream, shard.brand_id)
+            self._brand_shards.setdefault(brand_key, []).append(shard)
+        error: Optional[Exception] = None
+
+        # Workers are spawned, so they never inherit the coordinator's threads.
+        context = multiprocessing.get_context("spawn")
+        with tempfile.TemporaryDirectory() as output_dir, ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=context
+        ) as executor:
+            futures: Dict[Future, Tuple[Shard, str]] = {}
+            for index, shard in enumerate(shards):
+                output_path = os.path.join(output_dir, f"shard-{index}.jsonl")
+                partition_state = {}
+                if shard.start_date is None:
+                    partition_state = {
+                        "bookmarks": {
+                            shard.stream: self.tap.state.get("bookmarks", {}).get(
+                                shard.stream, {}
+                            )
+                        }
+                    }
+                future = executor.submit(
+                    run_shard, config, catalog, partition_state, shard, output_path
+                )
+                futures[future] = (shard, output_path)
+
+            not_done = set(futures)
+            while not_done and error is None:
+                done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard, output_path = futures[future]
+                    try:
+                        state, metrics = future.result()
+                    except Exception as exc:
+                        error = error or exc
+                        continue
+                    self._relay_output(output_path)
+                    os.remove(output_path)
+                    self.tap.metrics.merge(metrics)
+                    self._completed.add(shard)
+                    self._merge_state(shard, state)
+            for future in not_done:
+                future.cancel()
+
+        with self.tap.message_writer.lock:
+            self.tap.message_writer.write_state(self.tap.state)
+        if error is not None:
+            raise error
+
+    def _relay_output(self, output_path: str) -> None:
+        writer = self.tap.message_writer
+        with open(output_path) as output, writer.lock:
+            for line in output:
+                message_type = get_message_type(line)
+                if message_type == "STATE":
+                    continue
+                if message_type == "SCHEMA":
+                    stream_name = json.loads(line)["stream"]
+                    if stream_name in self._schemas_sent:
+                        continue
+                    self._schemas_sent.add(stream_name)
+                writer.write_line(line)
+
+    def _merge_state(self, shard: Shard, shard_tap_state: dict) -> None:
+        stream = self._streams[shard.stream]
+        context = {"brand_id": shard.brand_id}
+        shard_state = get_partition_state(shard_tap_state, shard.stream, shard.brand_id)
+        with self.tap.message_writer.lock:
+            state = stream.get_context_state(context)
+            if shard.start_date is not None and isinstance(
+                stream, DashHudsonTimeseriesStream
+            ):
+                synced = stream.get_synced_ranges(context) + ranges_from_state(
+                    shard_state.get("synced_ranges")
+                )
+                state["synced_ranges"] = ranges_to_state(merge_ranges(synced))
+                self._advance_bookmark(stream, shard, state)
+            else:
+                for key in [key for key in state if key != "context"]:
+                    del state[key]
+                for key, value in shard_state.items():
+                    if key != "context":
+                        state[key] = value
+            self.tap.message_writer.write_state(self.tap.state)
+
+    def _advance_bookmark(
+        self, stream: DashHudsonTimeseriesStream, shard: Shard, state: dict
+    ) -> None:
+        if stream.backfill_range is not None:
+            return
+        completed = None
+        for brand_shard in self._brand_shards[(shard.stream, shard.brand_id)]:
+            if brand_shard not in self._completed:
+                break
+            completed = brand_shard
+        if completed is None or completed.end_date is None:
+            return
+        bookmark = state.get("replication_key_value")
+        if not bookmark or completed.end_date.isoformat() > bookmark[:10]:
+            state["replication_key"] = stream.replication_key
+            state["replication_key_value"] = completed.end_date.isoformat()
@@ -0,0 +1,57 @@
+"""Incremental JSON parsing of API responses for tap-dash-hudson."""
+
+import importlib
+import re
+from types import ModuleType
+from typing import IO, Any, Dict, Iterable, Iterator, Optional
+
+ijson: Optional[ModuleType]
+try:
+    ijson = importlib.import_module("ijson")
+except ImportError:  # ijson is only needed when streaming responses
+    ijson = None
+
+_START_EVENTS = ("start_map", "start_array")
+_END_EVENTS = ("end_map", "end_array")
+
+
+def jsonpath_to_prefix(jsonpath: str) -> str:
+    """Convert a simple JSONPath such as `$.data[*]` to an ijson prefix."""
+    path = re.sub(r"^\$\.?", "", jsonpath)
+    path = path.replace("[*]", ".item")
+    return path.lstrip(".")
+
+
+def iter_items(
+    fileobj: IO[bytes], jsonpath: str, captures: Dict[str, Any]
+) -> Iterator[Any]:
+    """Yield the items at `jsonpath` while reading `fileobj` in chunks.
+
+    Scalar values found at any other JSONPath in `captures` are stored back into
+    it, which lets pagination tokens be picked up in the same single pass.
+    """
+    if ijson is None:
+        raise ImportError("Streaming responses require the `ijson` package.")
+
+    prefix = jsonpath_to_prefix(jsonpath)
+    capture_prefixes = {jsonpath_to_prefix(path): path for path in captures}
+    events: Iterable = ijson.parse(fileobj, use_float=True)
+    events = iter(events)
+    for path, event, value in events:
+        if path == prefix:
+            if event not in _START_EVENTS:
+                yield value
+                continue
+            builder = ijson.ObjectBuilder()
+            depth = 1
+            builder.event(event, value)
+            while depth:
+                path, event, value = next(events)
+                if event in _START_EVENTS:
+                    depth += 1
+                elif event in _END_EVENTS:
+                    depth -= 1
+                builder.event(event, value)
+            yield builder.value
+        elif path in capture_prefixes and event not in _START_EVENTS + _END_EVENTS:
+            captures[capture_prefixes[path]] = value
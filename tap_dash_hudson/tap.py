@@ -1,54 +1,47 @@
 """DashHudson tap class."""
 
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, cast
 
-from singer_sdk import Tap, Stream
+import requests
+from singer_sdk import Stream, Tap
 from singer_sdk import typing as th  # JSON schema typing helpers
-from tap_dash_hudson.facebook_streams import (
-    FacebookBusinessesStream,
-    FacebookPageMetricsStream,
-)
-from tap_dash_hudson.instagram_streams import (
-    InstagramDailyBrandUserInsightsStream,
-    InstagramDailyFollowersLostInsightsStream,
-    InstagramDailyFollowersDemographicsStream,
-    InstagramDailyFollowersInsightsStream,
-    InstagramRelationshipsStream,
+from singer_sdk.helpers._singer import Catalog
+
+from tap_dash_hudson.archive import ResponseArchive
+from tap_dash_hudson.async_engine import DEFAULT_ASYNC_CONCURRENCY, AsyncRequestEngine
+from tap_dash_hudson.batch import DEFAULT_BATCH_DIR, DEFAULT_BATCH_SIZE, BatchWriter
+from tap_dash_hudson.cache import (
+    DEFAULT_CACHE_MAX_MB,
+    DEFAULT_CACHE_TTL_SECONDS,
+    ResponseCache,
 )
-from tap_dash_hudson.pinterest_streams import (
-    PinterestAccountStream,
-    PinterestAccountStatsStream,
+from tap_dash_hudson.changes import ChangeIndex
+from tap_dash_hudson.client import DashHudsonStream, migrate_legacy_state
+from tap_dash_hudson.metrics import DEFAULT_METRICS_HOST, MetricsRegistry
+from tap_dash_hudson.registry import (
+    get_catalog_fingerprint,
+    get_selected_stream_names,
+    get_stream_class,
+    read_cached_catalog,
+    write_cached_catalog,
 )
-from tap_dash_hudson.twitter_streams import (
-    TwitterAccountStream,
-    TwitterMetricsStream,
+from tap_dash_hudson.sessions import DEFAULT_POOL_SIZE, create_session
+from tap_dash_hudson.sharding import DEFAULT_SHARD_DAYS, ShardCoordinator
+from tap_dash_hudson.throttle import TokenBucket
+from tap_dash_hudson.writer import (
+    DEFAULT_BUFFER_KB,
+    DEFAULT_FLUSH_SECONDS,
+    BufferedMessageWriter,
+    MessageWriter,
+    open_output,
 )
 
-FACEBOOK_STREAMS = [
-    FacebookBusinessesStream,
-    FacebookPageMetricsStream,
-]
-INSTAGRAM_STREAMS = [
-    InstagramDailyBrandUserInsightsStream,
-    InstagramDailyFollowersLostInsightsStream,
-    InstagramDailyFollowersDemographicsStream,
-    InstagramDailyFollowersInsightsStream,
-    InstagramRelationshipsStream,
-]
-PINTEREST_STREAMS = [
-    PinterestAccountStream,
-    PinterestAccountStatsStream,
-]
-TWITTER_STREAMS = [
-    TwitterAccountStream,
-    TwitterMetricsStream,
-]
-
-STREAM_TYPES = FACEBOOK_STREAMS + INSTAGRAM_STREAMS + PINTEREST_STREAMS + TWITTER_STREAMS
-
 
 class TapDashHudson(Tap):
     """DashHudson tap class."""
+
     name = "tap-dash-hudson"
 
     config_jsonschema = th.PropertiesList(
@@ -56,28 +49,546 @@ class TapDashHudson(Tap):
             "api_key",
             th.StringType,
             required=True,
-            description="The token to authenticate against the API service"
+            description="The token to authenticate against the API service",
+        ),
+        th.Property(
+            "api_url",
+            th.StringType,
+            required=False,
+            description="API URL root, where `{service}` is replaced by the backend "
+            "name (default `https://{service}.dashhudson.com`)",
         ),
         th.Property(
             "brand_id",
             th.NumberType,
-            required=True,
-            description="Brand IDs to query for"
+            required=False,
+            description="Brand ID to query for, superseded by `brand_ids`",
+        ),
+        th.Property(
+            "brand_ids",
+            th.ArrayType(th.IntegerType),
+            required=False,
+            description="Brand IDs to query for, each synced as its own partition",
+        ),
+        th.Property(
+            "brand_concurrency",
+            th.IntegerType,
+            required=False,
+            description="Number of brands fetched at the same time (default 4)",
+        ),
+        th.Property(
+            "date_concurrency",
+            th.IntegerType,
+            required=False,
+            description="Number of date windows requested at the same time by "
+            "timeseries streams (default 4)",
+        ),
+        th.Property(
+            "prefetch_pages",
+            th.IntegerType,
+            required=False,
+            description="Pages or date windows requested ahead of the one being "
+            "processed (default 1, 0 to disable)",
+        ),
+        th.Property(
+            "prefetch_buffer_mb",
+            th.IntegerType,
+            required=False,
+            description="Response bodies held by prefetched pages before no more "
+            "are requested (default 64)",
+        ),
+        th.Property(
+            "window_days",
+            th.IntegerType,
+            required=False,
+            description="Number of days covered by each timeseries request "
+            "(default 30)",
+        ),
+        th.Property(
+            "restatement_lookback_days",
+            th.IntegerType,
+            required=False,
+            description="Number of the most recently synced days timeseries streams "
+            "request again, as the API restates recent metrics (default 1)",
+        ),
+        th.Property(
+            "backfill_start_date",
+            th.DateTimeType,
+            required=False,
+            description="Start of a date range timeseries streams request instead of "
+            "their planned ranges, leaving bookmarks untouched",
+        ),
+        th.Property(
+            "backfill_end_date",
+            th.DateTimeType,
+            required=False,
+            description="End of the backfill range, defaults to `backfill_start_date`",
+        ),
+        th.Property(
+            "concurrent_streams",
+            th.BooleanType,
+            required=False,
+            description="Sync streams at the same time instead of one after another",
+        ),
+        th.Property(
+            "stream_concurrency_per_host",
+            th.IntegerType,
+            required=False,
+            description="Streams synced at the same time against each backend host "
+            "when `concurrent_streams` is enabled (default 1)",
+        ),
+        th.Property(
+            "stream_responses",
+            th.BooleanType,
+            required=False,
+            description="Parse large list responses incrementally as they download, "
+            "requires the `streaming` extra",
+        ),
+        th.Property(
+            "requests_per_second",
+            th.NumberType,
+            required=False,
+            description="Maximum request rate against each backend host, lowered "
+            "automatically when the API throttles requests. Unlimited "
+            "by default, pausing only when the API asks to",
+        ),
+        th.Property(
+            "http_pool_size",
+            th.IntegerType,
+            required=False,
+            description="Connections kept open to each backend host (default 10)",
+        ),
+        th.Property(
+            "http_keep_alive",
+            th.BooleanType,
+            required=False,
+            description="Reuse connections between requests (default true)",
+        ),
+        th.Property(
+            "http2",
+            th.BooleanType,
+            required=False,
+            description="Send requests over HTTP/2, requires the `http2` extra",
+        ),
+        th.Property(
+            "http_compression",
+            th.BooleanType,
+            required=False,
+            description="Accept compressed responses (default true), brotli and zstd "
+            "require the `compression` extra",
+        ),
+        th.Property(
+            "request_engine",
+            th.StringType,
+            required=False,
+            description="`sync` (default) or `async` to send requests from one asyncio "
+            "event loop, requires the `http2` extra",
+        ),
+        th.Property(
+            "async_concurrency",
+            th.IntegerType,
+            required=False,
+            description="Requests in flight per backend host with the async request "
+            "engine (default 10)",
+        ),
+        th.Property(
+            "response_cache_dir",
+            th.StringType,
+            required=False,
+            description="Directory caching the responses of full-table dimension "
+            "streams, disabled if unset",
+        ),
+        th.Property(
+            "response_cache_ttl",
+            th.IntegerType,
+            required=False,
+            description="Seconds a cached response is used without revalidation "
+            "(default 3600)",
+        ),
+        th.Property(
+            "response_cache_max_mb",
+            th.IntegerType,
+            required=False,
+            description="Size of the response cache before least recently used "
+            "entries are evicted (default 100)",
+        ),
+        th.Property(
+            "archive_dir",
+            th.StringType,
+            required=False,
+            description="Directory archiving the raw body of every API response, "
+            "gzipped and content-addressed, with its URL and parameters",
+        ),
+        th.Property(
+            "archive_mode",
+            th.StringType,
+            required=False,
+            description="`capture` to archive responses as they arrive (default), "
+            "or `replay` to read them from `archive_dir` instead of the API",
+        ),
+        th.Property(
+            "change_detection_db",
+            th.StringType,
+            required=False,
+            description="SQLite file of record digests, so full-table streams only "
+            "emit new or changed records, disabled if unset",
+        ),
+        th.Property(
+            "emit_tombstones",
+            th.BooleanType,
+            required=False,
+            description="With `change_detection_db`, emit records with "
+            "`_sdc_deleted_at` set for keys that disappeared",
+        ),
+        th.Property(
+            "validate_records",
+            th.BooleanType,
+            required=False,
+            description="Validate every record against its stream's JSON schema, "
+            "off by default as the API's payloads are trusted",
+        ),
+        th.Property(
+            "coerce_types",
+            th.BooleanType,
+            required=False,
+            description="Parse numeric strings, stringify numbers and give "
+            "`YYYY-MM-DD` days a midnight UTC time to match the schema "
+            "types, off by default so values are emitted as received",
+        ),
+        th.Property(
+            "batch_format",
+            th.StringType,
+            required=False,
+            description="Write records to `parquet` or `arrow` files announced by "
+            "BATCH messages instead of RECORD messages",
+        ),
+        th.Property(
+            "batch_dir",
+            th.StringType,
+            required=False,
+            description="Directory batch files are written under (default `output`)",
+        ),
+        th.Property(
+            "batch_size",
+            th.IntegerType,
+            required=False,
+            description="Records buffered before batch files are written "
+            "(default 100000)",
+        ),
+        th.Property(
+            "output_path",
+            th.StringType,
+            required=False,
+            description="File or named pipe Singer messages are written to instead "
+            "of STDOUT",
+        ),
+        th.Property(
+            "output_compression",
+            th.StringType,
+            required=False,
+            description="`gzip` or `zstd` to compress the Singer output, zstd "
+            "requires the `compression` extra",
+        ),
+        th.Property(
+            "output_buffer_kb",
+            th.IntegerType,
+            required=False,
+            description="Kilobytes of Singer messages buffered before they are "
+            "written (default 1024, 0 to write every message)",
+        ),
+        th.Property(
+            "output_flush_seconds",
+            th.NumberType,
+            required=False,
+            description="Seconds after which buffered messages are written "
+            "(default 1)",
+        ),
+        th.Property(
+            "output_encoder",
+            th.StringType,
+            required=False,
+            description="`json` (default) to serialize records exactly as "
+            "singer-python, or `orjson` for compact lines, requires the "
+            "`speedups` extra",
+        ),
+        th.Property(
+            "metrics_json_path",
+            th.StringType,
+            required=False,
+            description="File the run's performance metrics are written to as JSON",
+        ),
+        th.Property(
+            "metrics_prometheus_path",
+            th.StringType,
+            required=False,
+            description="File the run's performance metrics are written to in the "
+            "Prometheus text format, e.g. for node_exporter's textfile collector",
+        ),
+        th.Property(
+            "metrics_port",
+            th.IntegerType,
+            required=False,
+            description="Serve the performance metrics to Prometheus on "
+            "`http://{metrics_host}:{port}/metrics` while the tap runs",
+        ),
+        th.Property(
+            "metrics_host",
+            th.StringType,
+            required=False,
+            description="Interface the metrics server listens on, defaults to "
+            "127.0.0.1. Set 0.0.0.0 to be scraped from other hosts",
+        ),
+        th.Property(
+            "shard_processes",
+            th.IntegerType,
+            required=False,
+            description="Number of worker processes to shard the sync across by "
+            "stream, brand and date range, 1 to sync in this process",
+        ),
+        th.Property(
+            "shard_days",
+            th.IntegerType,
+            required=False,
+            description="Days of a timeseries stream synced by one shard",
+        ),
+        th.Property(
+            "catalog_cache_path",
+            th.StringType,
+            required=False,
+            description="File caching the discovered catalog, reused by `--discover` "
+            "until the tap version, its config or its streams change",
         ),
         th.Property(
             "start_date",
             th.DateTimeType,
             required=False,
-            description="Start date to collect metrics from"
+            description="Start date to collect metrics from",
         ),
         th.Property(
             "end_date",
             th.DateTimeType,
             required=False,
-            description="End date to collect metrics for"
+            description="End date to collect metrics for",
         ),
     ).to_dict()
 
+    def __init__(self, *args, **kwargs) -> None:
+        """Initialize the tap and the message writer shared by its streams."""
+        self.message_writer: MessageWriter = MessageWriter()
+        self.metrics = MetricsRegistry()
+        self._rate_limiters: Dict[str, TokenBucket] = {}
+        self._rate_limiters_lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._sessions_lock = threading.Lock()
+        self._async_engine: Optional[AsyncRequestEngine] = None
+        self._batch_writer: Optional[BatchWriter] = None
+        self._response_cache: Optional[ResponseCache] = None
+        self._response_archive: Optional[ResponseArchive] = None
+        self._change_index: Optional[ChangeIndex] = None
+        super().__init__(*args, **kwargs)
+        buffer_kb = self.config.get("output_buffer_kb", DEFAULT_BUFFER_KB)
+        if buffer_kb > 0:
+            self.message_writer = BufferedMessageWriter(
+                buffer_size=buffer_kb * 1024,
+                flush_seconds=self.config.get(
+                    "output_flush_seconds", DEFAULT_FLUSH_SECONDS
+                ),
+                encoder=self.config.get("output_encoder", "json"),
+            )
+
+    def load_state(self, state: dict) -> None:
+        """Load state, moving bookmarks from before brand partitions to their brand."""
+        super().load_state(migrate_legacy_state(state, self.config))
+
     def discover_streams(self) -> List[Stream]:
-        """Return a list of discovered streams."""
-        return [stream_class(tap=self) for stream_class in STREAM_TYPES]
+        """Return the streams selected in the input catalog, or all without one.
+
+        Only the modules of those streams are imported.
+        """
+        return [
+            get_stream_class(name)(tap=self)
+            for name in get_selected_stream_names(self.input_catalog)
+        ]
+
+    @property
+    def _singer_catalog(self) -> Catalog:
+        """Return the discovered catalog, from `catalog_cache_path` when still valid."""
+        path = self.config.get("catalog_cache_path")
+        if not path:
+            return super()._singer_catalog
+        fingerprint = get_catalog_fingerprint(dict(self.config), self.plugin_version)
+        catalog = read_cached_catalog(path, fingerprint)
+        if catalog is None:
+            catalog = super()._singer_catalog.to_dict()
+            write_cached_catalog(path, fingerprint, catalog)
+        return Catalog.from_dict(catalog)
+
+    def get_rate_limiter(self, service: str) -> TokenBucket:
+        """Return the rate limiter for a backend, created on first use."""
+        with self._rate_limiters_lock:
+            if service not in self._rate_limiters:
+                self._rate_limiters[service] = TokenBucket(
+                    self.config.get("requests_per_second")
+                )
+            return self._rate_limiters[service]
+
+    def get_session(self, url_base: str) -> requests.Session:
+        """Return the pooled session for a backend host, created on first use."""
+        with self._sessions_lock:
+            if url_base not in self._sessions:
+                self._sessions[url_base] = create_session(
+                    pool_size=self.config.get("http_pool_size", DEFAULT_POOL_SIZE),
+                    keep_alive=self.config.get("http_keep_alive", True),
+                    http2=self.config.get("http2", False),
+                )
+            return self._sessions[url_base]
+
+    @property
+    def async_engine(self) -> AsyncRequestEngine:
+        """Return the asyncio request engine shared by all streams."""
+        with self._sessions_lock:
+            if self._async_engine is None:
+                self._async_engine = AsyncRequestEngine(
+                    concurrency=self.config.get(
+                        "async_concurrency", DEFAULT_ASYNC_CONCURRENCY
+                    ),
+                    http2=self.config.get("http2", False),
+                )
+            return self._async_engine
+
+    @property
+    def response_cache(self) -> Optional[ResponseCache]:
+        """Return the response cache shared by all streams, if enabled."""
+        if not self.config.get("response_cache_dir"):
+            return None
+        with self._sessions_lock:
+            if self._response_cache is None:
+                self._response_cache = ResponseCache(
+                    self.config["response_cache_dir"],
+                    ttl=self.config.get(
+                        "response_cache_ttl", DEFAULT_CACHE_TTL_SECONDS
+                    ),
+                    max_bytes=self.config.get(
+                        "response_cache_max_mb", DEFAULT_CACHE_MAX_MB
+                    )
+                    * 1024
+                    * 1024,
+                )
+            return self._response_cache
+
+    @property
+    def response_archive(self) -> Optional[ResponseArchive]:
+        """Return the raw response archive shared by all streams, if enabled."""
+        if not self.config.get("archive_dir"):
+            return None
+        with self._sessions_lock:
+            if self._response_archive is None:
+                self._response_archive = ResponseArchive(
+                    self.config["archive_dir"],
+                    mode=self.config.get("archive_mode", "capture"),
+                )
+            return self._response_archive
+
+    @property
+    def change_index(self) -> ChangeIndex:
+        """Return the record digest index shared by the full-table streams."""
+        with self._sessions_lock:
+            if self._change_index is None:
+                self._change_index = ChangeIndex(self.config["change_detection_db"])
+            return self._change_index
+
+    @property
+    def batch_writer(self) -> Optional[BatchWriter]:
+        """Return the batch file writer shared by all streams, if enabled."""
+        if not self.config.get("batch_format"):
+            return None
+        with self._sessions_lock:
+            if self._batch_writer is None:
+                self._batch_writer = BatchWriter(
+                    self.message_writer,
+                    output_dir=self.config.get("batch_dir", DEFAULT_BATCH_DIR),
+                    file_format=self.config["batch_format"],
+                    batch_size=self.config.get("batch_size", DEFAULT_BATCH_SIZE),
+                )
+            return self._batch_writer
+
+    def sync_all(self) -> None:  # type: ignore[misc]
+        """Sync all streams, then export the run's performance metrics."""
+        if self.config.get("metrics_port"):
+            self.metrics.serve_prometheus(
+                self.config["metrics_port"],
+                self.config.get("metrics_host", DEFAULT_METRICS_HOST),
+            )
+        if self.config.get("output_path") or self.config.get("output_compression"):
+            self.message_writer.set_output(
+                open_output(
+                    self.config.get("output_path"),
+                    self.config.get("output_compression"),
+                )
+            )
+        try:
+            if self.config.get("shard_processes", 1) > 1:
+                ShardCoordinator(
+                    self,
+                    self.config["shard_processes"],
+                    self.config.get("shard_days", DEFAULT_SHARD_DAYS),
+                ).run()
+            elif self.config.get("concurrent_streams"):
+                self._sync_all_concurrently()
+            else:
+                super().sync_all()
+        finally:
+            self.export_metrics()
+            self.close_connections()
+            self.message_writer.close()
+
+    def close_connections(self) -> None:
+        """Close the pooled sessions and the asyncio engine opened by the run."""
+        with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            engine = self._async_engine
+            self._sessions = {}
+            self._async_engine = None
+        for session in sessions:
+            session.close()
+        if engine is not None:
+            engine.close()
+
+    def export_metrics(self) -> None:
+        """Write the metrics files enabled in the config."""
+        if self.config.get("metrics_json_path"):
+            self.metrics.write_json(self.config["metrics_json_path"])
+        if self.config.get("metrics_prometheus_path"):
+            self.metrics.write_prometheus(self.config["metrics_prometheus_path"])
+
+    def _sync_all_concurrently(self) -> None:
+        """Sync streams concurrently across backends."""
+        self._reset_state_progress_markers()
+        self._set_compatible_replication_methods()
+        streams: List[DashHudsonStream] = []
+        for stream in self.streams.values():
+            if not stream.selected and not stream.has_selected_descendents:
+                self.logger.info(f"Skipping deselected stream '{stream.name}'.")
+                continue
+            if stream.parent_stream_type:
+                continue
+            streams.append(cast(DashHudsonStream, stream))
+
+        per_host = self.config.get("stream_concurrency_per_host", 1)
+        host_limits: Dict[str, threading.Semaphore] = {
+            stream.url_base: threading.Semaphore(per_host) for stream in streams
+        }
+
+        def sync_stream(stream: DashHudsonStream) -> None:
+            with host_limits[stream.url_base]:
+                stream.sync()
+                stream.finalize_state_progress_markers()
+
+        if streams:
+            with ThreadPoolExecutor(max_workers=len(streams)) as executor:
+                futures = [executor.submit(sync_stream, stream) for stream in streams]
+                for future in futures:
+                    future.result()
+
+        for stream in self.streams.values():
+            stream.log_sync_costs()
@@ -0,0 +1,322 @@
+"""End-to-end throughput benchmark of the tap against the local mock server.
+
+Run with `python -m tap_dash_hudson.tests.benchmark`. Each stream is synced in
+its own process, so the reported peak RSS belongs to that stream alone, while
+the mock server keeps running in the parent process and counts the requests.
+`--cold-start` instead times whole tap processes from launch to exit.
+"""
+
+import argparse
+import datetime
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from tap_dash_hudson.tests.mock_server import MockDashHudsonServer
+from tap_dash_hudson.writer import get_message_type
+
+DEFAULT_DAYS = 90
+DEFAULT_BRAND_IDS = [1, 2]
+# Runs the tap's command line, as the `tap-dash-hudson` script does.
+TAP_COMMAND = [
+    sys.executable,
+    "-c",
+    "from tap_dash_hudson.tap import TapDashHudson; TapDashHudson.cli()",
+]
+
+
+class CountingSink:
+    """Stand-in for stdout counting the Singer messages written by the tap."""
+
+    def __init__(self) -> None:
+        """Initialize the sink."""
+        self.records = 0
+        self.messages = 0
+        self.bytes = 0
+
+    def write(self, data: str) -> int:
+        """Count the messages and records in `data`."""
+        self.bytes += len(data)
+        for line in data.splitlines():
+            if line:
+                self.messages += 1
+                if get_message_type(line) == "RECORD":
+                    self.records += 1
+        return len(data)
+
+    def flush(self) -> None:
+        """Do nothing, as nothing is buffered."""
+        pass
+
+
+def sync_stream(stream_name: str, config: dict) -> Dict[str, Any]:
+    """Sync one stream in this process and return its throughput figures."""
+    from tap_dash_hudson.tap import TapDashHudson
+
+    tap = TapDashHudson(config=config, parse_env_config=False)
+    stream = tap.streams[stream_name]
+    sink = CountingSink()
+    stdout = sys.stdout
+    sys.stdout = sink
+    started = time.perf_counter()
+    try:
+        tap._reset_state_progress_markers()
+        stream.sync()
+    finally:
+        sys.stdout = stdout
+    elapsed = time.perf_counter() - started
+    return {
+        "stream": stream_name,
+        "records": sink.records,
+        "messages": sink.messages,
+        "output_bytes": sink.bytes,
+        "seconds": elapsed,
+        "records_per_second": sink.records / elapsed if elapsed else 0.0,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_benchmark(
+    streams: Optional[List[str]] = None,
+    days: int = DEFAULT_DAYS,
+    brand_ids: Optional[List[int]] = None,
+    latency: float = 0.0,
+    page_size: int = 100,
+    relationships: int = 1000,
+    throttle_every: int = 0,
+    tap_config: Optional[dict] = None,
+) -> List[Dict[str, Any]]:
+    """Sync each stream against a fresh mock server and return one result per stream.
+
+    `tap_config` is merged over the benchmark's own settings, so tuning knobs
+    such as `brand_concurrency` or `request_engine` can be compared run to run.
+    """
+    from tap_dash_hudson.tap import TapDashHudson
+
+    end_date = datetime.date.today() - datetime.timedelta(days=1)
+    start_date = end_date - datetime.timedelta(days=days - 1)
+    results = []
+    with MockDashHudsonServer(
+        latency=latency,
+        page_size=page_size,
+        relationships=relationships,
+        throttle_every=throttle_every,
+    ) as server:
+        config = {
+            "api_key": "benchmark",
+            "api_url": server.api_url,
+            "brand_ids": brand_ids or DEFAULT_BRAND_IDS,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "requests_per_second": 1000,
+            **(tap_config or {}),
+        }
+        if streams is None:
+            streams = list(TapDashHudson(config=config, parse_env_config=False).streams)
+        for stream_name in streams:
+            requests_before = server.request_count
+            throttled_before = server.throttled_count
+            child = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "tap_dash_hudson.tests.benchmark",
+                    "--child",
+                    stream_name,
+                    json.dumps(config),
+                ],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                check=True,
+                text=True,
+            )
+            result = json.loads(child.stdout)
+            result["requests"] = server.request_count - requests_before
+            result["throttled"] = server.throttled_count - throttled_before
+            result["requests_per_second"] = (
+                result["requests"] / result["seconds"] if result["seconds"] else 0.0
+            )
+            results.append(result)
+    return results
+
+
+def _time_tap(args: List[str], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run(
+            TAP_COMMAND + args,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        )
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run_cold_start_benchmark(
+    stream: str = "twitter_account", repeat: int = 3
+) -> List[Dict[str, Any]]:
+    """Return the best of `repeat` wall times of short-lived tap processes.
+
+    Times discovery with and without `catalog_cache_path`, and a one-day sync
+    of `stream` with a catalog selecting only that stream.
+    """
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    with MockDashHudsonServer() as server, tempfile.TemporaryDirectory() as tmp_dir:
+        directory = Path(tmp_dir)
+        config = {
+            "api_key": "benchmark",
+            "api_url": server.api_url,
+            "brand_ids": DEFAULT_BRAND_IDS,
+            "start_date": yesterday.isoformat(),
+            "end_date": yesterday.isoformat(),
+        }
+        config_path = directory / "config.json"
+        config_path.write_text(json.dumps(config))
+        cached_config_path = directory / "cached_config.json"
+        cached_config_path.write_text(
+            json.dumps({**config, "catalog_cache_path": str(directory / "cache.json")})
+        )
+
+        discovery = subprocess.run(
+            TAP_COMMAND + ["--config", str(cached_config_path), "--discover"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            text=True,
+        )
+        catalog = json.loads(discovery.stdout)
+        for entry in catalog["streams"]:
+            for metadata in entry["metadata"]:
+                if not metadata["breadcrumb"]:
+                    metadata["metadata"]["selected"] = entry["tap_stream_id"] == stream
+        catalog_path = directory / "catalog.json"
+        catalog_path.write_text(json.dumps(catalog))
+
+        return [
+            {
+                "scenario": "discover",
+                "seconds": _time_tap(
+                    ["--config", str(config_path), "--discover"], repeat
+                ),
+            },
+            {
+                "scenario": "discover, cached catalog",
+                "seconds": _time_tap(
+                    ["--config", str(cached_config_path), "--discover"], repeat
+                ),
+            },
+            {
+                "scenario": f"sync {stream} only",
+                "seconds": _time_tap(
+                    ["--config", str(config_path), "--catalog", str(catalog_path)],
+                    repeat,
+                ),
+            },
+        ]
+
+
+def format_results(results: List[Dict[str, Any]]) -> str:
+    """Return the benchmark results as a plain text table."""
+    header = (
+        f"{'stream':<42}{'records':>10}{'requests':>10}{'rec/s':>12}"
+        f"{'req/s':>10}{'seconds':>10}{'rss MB':>10}"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result['stream']:<42}{result['records']:>10}{result['requests']:>10}"
+            f"{result['records_per_second']:>12.1f}"
+            f"{result['requests_per_second']:>10.1f}"
+            f"{result['seconds']:>10.2f}{result['peak_rss_kb'] / 1024:>10.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--child", nargs=2, metavar=("STREAM", "CONFIG"), help=argparse.SUPPRESS
+    )
+    parser.add_argument(
+        "--stream",
+        action="append",
+        dest="streams",
+        help="Stream to benchmark, repeatable",
+    )
+    parser.add_argument(
+        "--days", type=int, default=DEFAULT_DAYS, help="Days of history to sync"
+    )
+    parser.add_argument(
+        "--brand-id",
+        type=int,
+        action="append",
+        dest="brand_ids",
+        help="Brand to sync, repeatable",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds of server latency per request",
+    )
+    parser.add_argument(
+        "--page-size", type=int, default=100, help="Relationships per page"
+    )
+    parser.add_argument(
+        "--relationships", type=int, default=1000, help="Relationships per brand"
+    )
+    parser.add_argument(
+        "--throttle-every",
+        type=int,
+        default=0,
+        help="Answer every n-th request with a 429",
+    )
+    parser.add_argument(
+        "--config", type=json.loads, default=None, help="JSON tap settings to merge in"
+    )
+    parser.add_argument(
+        "--cold-start", action="store_true", help="Time tap startup instead"
+    )
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        results = run_cold_start_benchmark()
+        for result in results:
+            print(f"{result['scenario']:<42}{result['seconds']:>10.2f}s")
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump(results, output, indent=2)
+        return
+
+    if args.child:
+        stream_name, config = args.child
+        print(json.dumps(sync_stream(stream_name, json.loads(config))))
+        return
+
+    results = run_benchmark(
+        streams=args.streams,
+        days=args.days,
+        brand_ids=args.brand_ids,
+        latency=args.latency,
+        page_size=args.page_size,
+        relationships=args.relationships,
+        throttle_every=args.throttle_every,
+        tap_config=args.config,
+    )
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""Local stand-in for the Dash Hudson API, used by tests and benchmarks."""
+
+import datetime
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from tap_dash_hudson.facebook_streams import FacebookPageMetricsStream
+from tap_dash_hudson.instagram_streams import InstagramRelationshipsStream
+from tap_dash_hudson.twitter_streams import TwitterMetricsStream
+
+INSIGHTS_METRICS = [
+    "followers",
+    "impressions",
+    "reach",
+    "profile_views",
+    "website_clicks",
+]
+PINTEREST_METRICS = [
+    "impressions",
+    "saves",
+    "pin_clicks",
+    "outbound_clicks",
+    "engagement",
+]
+
+
+def _metric_names(schema: dict) -> List[str]:
+    return [name for name in schema["properties"] if name not in ("brand_id", "date")]
+
+
+def _date_range(query: Dict[str, List[str]]) -> List[str]:
+    start = datetime.date.fromisoformat(query["start_date"][0])
+    end = datetime.date.fromisoformat(query["end_date"][0])
+    return [
+        (start + datetime.timedelta(days=offset)).isoformat()
+        for offset in range((end - start).days + 1)
+    ]
+
+
+def _relationship(index: int) -> dict:
+    record: Dict[str, Any] = {}
+    for name, prop in InstagramRelationshipsStream.schema["properties"].items():
+        kind = prop.get("type", ["null"])
+        if "number" in kind:
+            record[name] = index * 1.5
+        elif "boolean" in kind:
+            record[name] = index % 2 == 0
+        elif prop.get("format") == "date-time":
+            record[name] = "2022-01-01T00:00:00"
+        elif "string" in kind:
+            record[name] = f"{name}-{index}"
+    record["id"] = index
+    record["tags"] = [{"id": index, "color": "#000000", "name": "tag"}]
+    record["user"] = {
+        "handle": f"user{index}",
+        "followers": index,
+        "instagram_id": index,
+    }
+    return record
+
+
+class MockDashHudsonServer:
+    """Serve realistic payloads for every endpoint used by the tap's streams.
+
+    Requests are routed as `/{service}/brands/{brand_id}/...`, so the tap points
+    at it with `api_url` set to `server.api_url`. `latency` seconds are added
+    before every response, relationships are served `page_size` at a time up to
+    `relationships` per brand, every `throttle_every`-th request gets a 429 (0
+    to disable) and the `fail_request`-th request gets a 400, as an interrupted
+    sync.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        page_size: int = 100,
+        relationships: int = 1000,
+        throttle_every: int = 0,
+        fail_request: int = 0,
+    ) -> None:
+        """Initialize the server and start serving."""
+        self.latency = latency
+        self.page_size = page_size
+        self.relationships = relationships
+        self.throttle_every = throttle_every
+        self.fail_request = fail_request
+        self.request_count = 0
+        self.throttled_count = 0
+        self.connection_count = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._routes: List[Tuple[str, str, Callable[[dict], Any]]] = [
+            ("facebook", r"fb_businesses", self._facebook_businesses),
+            (
+                "facebook",
+                r"page/metrics",
+                self._timeseries_metrics(
+                    _metric_names(FacebookPageMetricsStream.schema)
+                ),
+            ),
+            ("instagram-backend", r"brand_user_insights", self._insights),
+            ("instagram-backend", r"followers_lost_insights", self._insights),
+            ("instagram-backend", r"followers_insights", self._insights),
+            ("instagram-backend", r"followers_demographics", self._demographics),
+            ("instagram-backend", r"instagram/relationships", self._relationships),
+            ("pinterest", r"account", self._pinterest_account),
+            ("pinterest", r"account/stats", self._pinterest_stats),
+            ("twitter", r"account", self._twitter_account),
+            (
+                "twitter",
+                r"metrics",
+                self._timeseries_metrics(_metric_names(TwitterMetricsStream.schema)),
+            ),
+        ]
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_url(self) -> str:
+        """Return the `api_url` tap setting pointing at this server."""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/{{service}}"
+
+    def start(self) -> "MockDashHudsonServer":
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockDashHudsonServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def handle(self, url: str) -> Tuple[int, Dict[str, str], bytes]:
+        """Return the status, headers and body answering `url`."""
+        parsed = urlparse(url)
+        match = re.match(r"^/([^/]+)/brands/(\d+)/(.+)$", parsed.path)
+        with self._lock:
+            self.request_count += 1
+            throttled = (
+                self.throttle_every and self.request_count % self.throttle_every == 0
+            )
+            if throttled:
+                self.throttled_count += 1
+            failed = self.request_count == self.fail_request
+        if self.latency:
+            time.sleep(self.latency)
+        if throttled:
+            return 429, {"Retry-After": "0"}, b"{}"
+        if failed:
+            return 400, {}, b"{}"
+        if not match:
+            return 404, {}, b"{}"
+
+        service, brand_id, endpoint = match.groups()
+        for route_service, route, handler in self._routes:
+            if route_service == service and re.fullmatch(route, endpoint):
+                request = {
+                    "brand_id": int(brand_id),
+                    "query": parse_qs(parsed.query),
+                    "url": f"{parsed.path}",
+                }
+                body = json.dumps(handler(request)).encode()
+                with self._lock:
+                    self.bytes_sent += len(body)
+                return 200, {"Content-Type": "application/json"}, body
+        return 404, {}, b"{}"
+
+    def _handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connection_count += 1
+
+            def do_GET(self) -> None:
+                status, headers, body = server.handle(self.path)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    # Endpoint payloads
+
+    def _facebook_businesses(self, request: dict) -> list:
+        return [
+            {"id": str(index), "name": f"Business {index}", "profile_picture_uri": ""}
+            for index in range(3)
+        ]
+
+    def _timeseries_metrics(self, metrics: List[str]) -> Callable[[dict], dict]:
+        def handler(request: dict) -> dict:
+            selected = request["query"].get("metrics")
+            names = selected[0].split(",") if selected else metrics
+            metrics_values = {
+                name: index for index, name in enumerate(metrics) if name in names
+            }
+            return {
+                "timeseries_metrics": [
+                    {
+                        "timestamp": date,
+                        "metrics": metrics_values,
+                    }
+                    for date in _date_range(request["query"])
+                ]
+            }
+
+        return handler
+
+    def _insights(self, request: dict) -> dict:
+        dates = _date_range(request["query"])
+        return {
+            metric: {"labels": dates, "values": list(range(len(dates)))}
+            for metric in INSIGHTS_METRICS
+        }
+
+    def _demographics(self, request: dict) -> dict:
+        return {
+            "followers": {
+                "gender_age": {
+                    f"{gender}.{age}": 10
+                    for gender in ("F", "M", "U")
+                    for age in ("13-17", "18-24", "25-34", "35-44", "45-54", "55-64")
+                },
+                "total": 1000,
+            },
+            "country": {"countries": {"CA": 500, "US": 400, "GB": 100}},
+        }
+
+    def _relationships(self, request: dict) -> dict:
+        offset = int(request["query"].get("offset", ["0"])[0])
+        end = min(offset + self.page_size, self.relationships)
+        next_url = None
+        if end < self.relationships:
+            query = urlencode({"all_relationships": True, "offset": end})
+            next_url = f"{request['url']}?{query}"
+        return {
+            "data": [_relationship(index) for index in range(offset, end)],
+            "paging": {"next": next_url},
+        }
+
+    def _pinterest_account(self, request: dict) -> list:
+        return [
+            {
+                "id": 1,
+                "brand_id": request["brand_id"],
+                "pinterest_account_id": "1",
+                "pinterest_username": "brand",
+                "total_followers": 1000,
+                "created_at": "2020-01-01T00:00:00",
+            }
+        ]
+
+    def _pinterest_stats(self, request: dict) -> dict:
+        return {
+            date: {metric: index for index, metric in enumerate(PINTEREST_METRICS)}
+            for date in _date_range(request["query"])
+        }
+
+    def _twitter_account(self, request: dict) -> list:
+        return [
+            {
+                "id": 1,
+                "brand_id": request["brand_id"],
+                "handle": "brand",
+                "total_followers": 1000,
+                "twitter_user_id": "1",
+            }
+        ]
@@ -1,10 +1,48 @@
 """Tests standard tap features using the built-in SDK tests library."""
 
 import datetime
+import gzip
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
+import pytest
+import requests
+import singer
+from singer_sdk.exceptions import FatalAPIError
+from singer_sdk.helpers._singer import Catalog
 from singer_sdk.testing import get_standard_tap_tests
 
+from tap_dash_hudson import client
+from tap_dash_hudson.archive import ResponseArchive
+from tap_dash_hudson.batch import BatchWriter
+from tap_dash_hudson.cache import ResponseCache
+from tap_dash_hudson.changes import ChangeIndex, ChangeTracker
+from tap_dash_hudson.client import get_brand_ids
+from tap_dash_hudson.concurrency import ordered_map, prefetch
+from tap_dash_hudson.conform import RecordConformer
+from tap_dash_hudson.metrics import MetricsRegistry, to_labels
+from tap_dash_hudson.planner import plan_ranges
+from tap_dash_hudson.registry import (
+    STREAM_CLASSES,
+    get_selected_stream_names,
+    read_cached_catalog,
+    write_cached_catalog,
+)
+from tap_dash_hudson.sharding import ShardCoordinator
 from tap_dash_hudson.tap import TapDashHudson
+from tap_dash_hudson.tests.benchmark import run_benchmark
+from tap_dash_hudson.tests.mock_server import MockDashHudsonServer
+from tap_dash_hudson.throttle import TokenBucket
+from tap_dash_hudson.transform import iter_metric_rows, unpivot_mapping, unpivot_series
+from tap_dash_hudson.writer import (
+    BufferedMessageWriter,
+    MessageWriter,
+    get_message_type,
+    open_output,
+)
 
 SAMPLE_CONFIG = {
     "start_date": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
@@ -15,12 +53,813 @@ SAMPLE_CONFIG = {
 # Run standard built-in tap tests from the SDK:
 def test_standard_tap_tests():
     """Run standard tap tests from the SDK."""
-    tests = get_standard_tap_tests(
-        TapDashHudson,
-        config=SAMPLE_CONFIG
-    )
+    tests = get_standard_tap_tests(TapDashHudson, config=SAMPLE_CONFIG)
     for test in tests:
         test()
 
 
+def test_ordered_map_keeps_input_order():
+    """Results come back in input order even when later items finish first."""
+
+    def slow_for_small(value):
+        time.sleep(0.01 * (5 - value))
+        return value * 2
+
+    assert list(ordered_map(slow_for_small, range(5), max_workers=3)) == [0, 2, 4, 6, 8]
+
+
+def test_prefetch_stops_at_memory_budget():
+    """Items are produced ahead of the caller until the byte budget is held."""
+    produced = []
+
+    def produce():
+        for value in range(6):
+            produced.append(value)
+            yield value
+
+    items = prefetch(produce(), max_items=5, max_bytes=3, get_size=lambda value: 2)
+    assert next(items) == 0
+    time.sleep(0.05)
+    assert produced == [0, 1, 2]
+    assert list(items) == [1, 2, 3, 4, 5]
+    assert list(prefetch(iter(range(3)), 1, 0, get_size=lambda value: 1)) == [0, 1, 2]
+
+
+def test_get_brand_ids():
+    """`brand_ids` takes precedence over the legacy `brand_id` setting."""
+    assert get_brand_ids({"brand_id": 1}) == [1]
+    assert get_brand_ids({"brand_id": 1, "brand_ids": [2, 3]}) == [2, 3]
+
+
+def test_unpivot():
+    """Both wide payload shapes unpivot into the same long rows."""
+    series = {"reach": {"labels": ["2022-01-01", "2022-01-02"], "values": [1, 2]}}
+    mapping = {"2022-01-01": {"reach": 1}, "2022-01-02": {"reach": 2}}
+    expected = [
+        {"date": "2022-01-01", "metric_name": "reach", "metric_value": 1},
+        {"date": "2022-01-02", "metric_name": "reach", "metric_value": 2},
+    ]
+    assert list(iter_metric_rows(unpivot_series(series))) == expected
+    assert list(iter_metric_rows(unpivot_mapping(mapping))) == expected
+
+
+def test_legacy_stream_bookmark_moves_to_brand_partition():
+    """A stream-level bookmark from before brand partitions is not re-backfilled."""
+    tap = TapDashHudson(
+        config={
+            "api_key": "test",
+            "brand_id": 1,
+            "start_date": "2016-12-01",
+            "end_date": "2022-01-12",
+        },
+        state={
+            "bookmarks": {
+                "twitter_metrics": {
+                    "replication_key": "date",
+                    "replication_key_value": "2022-01-10T00:00:00+00:00",
+                }
+            }
+        },
+        parse_env_config=False,
+    )
+    stream = tap.streams["twitter_metrics"]
+    assert stream.get_date_ranges({"brand_id": 1}) == [
+        (datetime.date(2022, 1, 10), datetime.date(2022, 1, 12))
+    ]
+    assert "replication_key_value" not in tap.state["bookmarks"]["twitter_metrics"]
+
+
+def test_plan_ranges():
+    """Only gaps and the restatement lookback are planned."""
+    day = datetime.date
+    synced = [(day(2022, 1, 1), day(2022, 1, 10)), (day(2022, 1, 15), day(2022, 1, 20))]
+    assert plan_ranges(synced, day(2022, 1, 1), day(2022, 1, 25), lookback_days=3) == [
+        (day(2022, 1, 11), day(2022, 1, 14)),
+        (day(2022, 1, 18), day(2022, 1, 25)),
+    ]
+    assert plan_ranges([], day(2022, 1, 1), day(2022, 1, 5)) == [
+        (day(2022, 1, 1), day(2022, 1, 5))
+    ]
+
+
+def test_record_conformer():
+    """Values are kept as received unless coercion is enabled."""
+    schema = {
+        "properties": {
+            "date": {"type": ["string", "null"], "format": "date-time"},
+            "day": {"type": ["string", "null"], "format": "date"},
+            "metric_value": {"type": ["number", "null"]},
+            "label": {"type": ["string", "null"]},
+            "user": {
+                "type": ["object", "null"],
+                "properties": {"followers": {"type": ["number", "null"]}},
+            },
+        }
+    }
+    record = {
+        "date": "2022-01-01",
+        "day": "2022-01-01",
+        "metric_value": "1.5",
+        "label": 7,
+        "user": {"followers": "2"},
+        "x": 1,
+    }
+    conformer = RecordConformer("metrics", schema, logging.getLogger())
+    assert conformer.conform(record) == {
+        "date": "2022-01-01",
+        "day": "2022-01-01",
+        "metric_value": "1.5",
+        "label": 7,
+        "user": {"followers": "2"},
+    }
+    conformer = RecordConformer(
+        "metrics", schema, logging.getLogger(), validate=True, coerce=True
+    )
+    assert conformer.conform(record) == {
+        "date": "2022-01-01T00:00:00+00:00",
+        "day": "2022-01-01",
+        "metric_value": 1.5,
+        "label": "7",
+        "user": {"followers": 2.0},
+    }
+
+
+def test_response_cache_revalidates_and_evicts(tmp_path):
+    """Stored validators become conditional headers, oldest entries are evicted."""
+    cache = ResponseCache(str(tmp_path), max_bytes=10)
+    keys = []
+    for path in ("a", "b"):
+        request = requests.Request("GET", f"https://api.test/{path}").prepare()
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"[1, 2]"
+        response.headers["ETag"] = f'"{path}"'
+        keys.append(cache.get_key(request))
+        assert cache.put(keys[-1], response).to_response(request).json() == [1, 2]
+
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]).conditional_headers == {"If-None-Match": '"b"'}
+
+
+def test_response_cache_evicts_least_recently_used_without_rescanning(
+    tmp_path, monkeypatch
+):
+    """Eviction follows reads, and the directory is only scanned on first use."""
+
+    def put(cache: ResponseCache, name: str) -> str:
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"12345"
+        key = cache.get_key(
+            requests.Request("GET", f"https://api.test/{name}").prepare()
+        )
+        cache.put(key, response)
+        return key
+
+    first = ResponseCache(str(tmp_path), max_bytes=10)
+    a, b = put(first, "a"), put(first, "b")
+    scans = []
+    glob = Path.glob
+    monkeypatch.setattr(Path, "glob", lambda *args: scans.append(1) or glob(*args))
+
+    # A new cache reads the sizes stored by the previous run once.
+    cache = ResponseCache(str(tmp_path), max_bytes=10)
+    assert cache.get(a) is not None
+    c = put(cache, "c")
+    assert cache.get(b) is None
+    assert cache.get(a) is not None
+    d = put(cache, "d")
+    assert cache.get(c) is None
+    assert cache.get(a) is not None and cache.get(d) is not None
+    assert len(scans) == 1
+
+
+def test_response_archive_replays_captured_bodies(tmp_path):
+    """Captured bodies are stored once and replayed for the same request."""
+    capture = ResponseArchive(str(tmp_path))
+    for date in ("2022-01-01", "2022-01-02"):
+        request = requests.Request(
+            "GET", f"https://api.test/metrics?date={date}"
+        ).prepare()
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"[1, 2]"
+        capture.put(request, response)
+
+    assert len(list((tmp_path / "objects").glob("*/*.gz"))) == 1
+    replay = ResponseArchive(str(tmp_path), mode="replay")
+    assert replay.get(request).json() == [1, 2]
+    with pytest.raises(LookupError):
+        replay.get(requests.Request("GET", "https://api.test/other").prepare())
+
+
+def test_response_archive_replays_latest_capture_of_each_request(tmp_path):
+    """A request captured again, whatever its parameter order, is replayed once."""
+    capture = ResponseArchive(str(tmp_path))
+    for url, body in (
+        ("https://api.test/metrics?start=1&end=2", b"[1]"),
+        ("https://api.test/metrics?start=3&end=4", b"[2]"),
+        ("https://api.test/metrics?end=2&start=1", b"[3]"),
+    ):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        capture.put(requests.Request("GET", url).prepare(), response)
+        time.sleep(0.01)
+
+    replay = ResponseArchive(str(tmp_path), mode="replay")
+    bodies = [r.json() for r in replay.iter_responses("https://api.test/metrics")]
+    assert bodies == [[2], [3]]
+
+
+def test_archive_replay_parses_every_captured_response(tmp_path, capsys):
+    """Replays parse the archived windows of each brand, whatever the config."""
+    config = {
+        "api_key": "test",
+        "brand_ids": [1, 2],
+        "start_date": "2022-01-01",
+        "end_date": "2022-01-10",
+        "window_days": 5,
+        "archive_dir": str(tmp_path),
+    }
+    with MockDashHudsonServer() as server:
+        config["api_url"] = server.api_url
+        capture = TapDashHudson(config=config, parse_env_config=False)
+        capture._reset_state_progress_markers()
+        capture.streams["twitter_metrics"].sync()
+    captured = [
+        json.loads(line)["record"]
+        for line in capsys.readouterr().out.splitlines()
+        if '"RECORD"' in line
+    ]
+
+    # The server is gone, so every record comes from the archive.
+    replay = TapDashHudson(
+        config={
+            **config,
+            "start_date": "2022-01-05",
+            "window_days": 1,
+            "archive_mode": "replay",
+        },
+        parse_env_config=False,
+    )
+    replay._reset_state_progress_markers()
+    replay.streams["twitter_metrics"].sync()
+    replayed = [
+        json.loads(line)["record"]
+        for line in capsys.readouterr().out.splitlines()
+        if '"RECORD"' in line
+    ]
+    assert len(captured) == 20
+    assert sorted(replayed, key=json.dumps) == sorted(captured, key=json.dumps)
+
+
+def test_change_tracker(tmp_path):
+    """Only new or changed records are reported, missing keys become removals."""
+    index = ChangeIndex(str(tmp_path / "changes.db"))
+    first = ChangeTracker(index, "relationships", ["id"])
+    assert first.is_changed({"brand_id": 1, "id": 1, "email": "a"})
+    assert first.is_changed({"brand_id": 1, "id": 2, "email": "b"})
+    first.commit([1])
+
+    second = ChangeTracker(index, "relationships", ["id"])
+    assert not second.is_changed({"brand_id": 1, "id": 1, "email": "a"})
+    assert second.get_removed([1]) == [{"id": 2, "brand_id": 1}]
+    assert second.get_removed([2]) == []
+
+    # A resumed sync only adds digests, it cannot tell which keys were deleted.
+    assert second.is_changed({"brand_id": 1, "id": 3, "email": "c"})
+    second.merge()
+    assert set(ChangeTracker(index, "relationships", ["id"]).previous) == {
+        ("1", "[1]"),
+        ("1", "[2]"),
+        ("1", "[3]"),
+    }
+
+
+def test_batch_writer_partitions_by_brand(tmp_path, capsys):
+    """Batch files are split per brand and STATE follows the BATCH messages."""
+    parquet = pytest.importorskip("pyarrow.parquet")
+    schema = {
+        "properties": {
+            "brand_id": {"type": ["number", "null"]},
+            "date": {"type": ["string", "null"], "format": "date-time"},
+        }
+    }
+    writer = BatchWriter(MessageWriter(), str(tmp_path), "parquet")
+    for brand_id in (1, 2, 1):
+        writer.write_record(
+            "metrics", schema, {"brand_id": brand_id, "date": "2022-01-01"}
+        )
+    writer.write_state({"bookmarks": {}})
+    writer.flush()
+
+    files = sorted((tmp_path / "metrics").glob("*/*.parquet"))
+    assert [parquet.read_table(path).num_rows for path in files] == [2, 1]
+    # Readers of the whole directory get a single, numeric `brand_id` column.
+    table = parquet.read_table(tmp_path / "metrics")
+    assert sorted(table.column("brand_id").to_pylist()) == [1.0, 1.0, 2.0]
+    messages = [line.split('"')[3] for line in capsys.readouterr().out.splitlines()]
+    assert messages == ["BATCH", "BATCH", "STATE"]
+
+
+def test_message_writer_compresses_output(tmp_path):
+    """Messages written to a gzip output read back as Singer lines."""
+    path = str(tmp_path / "output.jsonl.gz")
+    writer = MessageWriter()
+    writer.set_output(open_output(path, "gzip"))
+    writer.write_line('{"type": "RECORD", "stream": "s", "record": {}}')
+    writer.write_state({"bookmarks": {}})
+    writer.close()
+
+    with gzip.open(path, "rt") as output:
+        assert [line.split('"')[3] for line in output] == ["RECORD", "STATE"]
+
+
+def test_buffered_writer_matches_singer_output(capsys):
+    """Buffered records are written as singer-python writes them, up to each STATE."""
+    messages = [
+        singer.RecordMessage(
+            stream="metrics",
+            record={"date": "2022-01-01", "metric_value": 1.5, "name": "caf\u00e9"},
+            time_extracted=datetime.datetime.now(datetime.timezone.utc),
+        ),
+        singer.RecordMessage(stream="metrics", record={"metric_value": None}),
+        singer.StateMessage(value={"bookmarks": {}}),
+    ]
+    writer = BufferedMessageWriter(flush_seconds=60)
+    writer.write_message(messages[0])
+    writer.write_message(messages[1])
+    assert capsys.readouterr().out == ""
+    writer.write_message(messages[2])
+    assert capsys.readouterr().out == "".join(
+        singer.format_message(message) + "\n" for message in messages
+    )
+
+
+def test_buffered_writer_flushes_compact_state_and_on_a_timer(capsys):
+    """Compact STATE lines flush the buffer, and idle buffers flush on a timer."""
+    writer = BufferedMessageWriter(flush_seconds=0.2, encoder="orjson")
+    writer.write_message(singer.RecordMessage(stream="s", record={"a": 1}))
+    assert capsys.readouterr().out == ""
+    time.sleep(0.5)
+    output = capsys.readouterr().out
+    assert output == '{"type":"RECORD","stream":"s","record":{"a":1}}\n'
+    assert get_message_type(output) == "RECORD"
+
+    writer.write_message(singer.RecordMessage(stream="s", record={"a": 2}))
+    writer.write_line('{"type":"STATE","value":{}}')
+    assert capsys.readouterr().out.splitlines()[-1] == '{"type":"STATE","value":{}}'
+    writer.close()
+
+
+def test_metrics_registry():
+    """Series are aggregated per label set and exported for Prometheus."""
+    metrics = MetricsRegistry()
+    labels = to_labels(service="twitter", stream="twitter_metrics", brand_id=1)
+    metrics.add("records_total", labels, 3)
+    metrics.observe("http_request_duration_seconds", labels, 0.2)
+    assert list(metrics.timed([1, 2], "parse_seconds_total", labels)) == [1, 2]
+
+    assert metrics.get_counters(stream="twitter_metrics")["records_total"] == 3
+    exposition = metrics.to_prometheus()
+    assert 'tap_dash_hudson_records_total{brand_id="1",service="twitter"' in exposition
+    assert "tap_dash_hudson_http_request_duration_seconds_count" in exposition
+
+    server = metrics.serve_prometheus(0)
+    try:
+        host, port = server.server_address
+        assert host == "127.0.0.1"
+        response = requests.get(f"http://127.0.0.1:{port}/metrics")
+        assert response.text == metrics.to_prometheus()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_stream_registry(tmp_path):
+    """Only selected streams are loaded and cached catalogs expire with the config."""
+    catalog = Catalog.from_dict(
+        {
+            "streams": [
+                {
+                    "tap_stream_id": name,
+                    "metadata": [
+                        {
+                            "breadcrumb": [],
+                            "metadata": {"selected": name == "twitter_account"},
+                        }
+                    ],
+                }
+                for name in STREAM_CLASSES
+            ]
+        }
+    )
+    assert get_selected_stream_names(catalog) == ["twitter_account"]
+    assert get_selected_stream_names(None) == list(STREAM_CLASSES)
+
+    path = str(tmp_path / "catalog.json")
+    write_cached_catalog(path, "abc", {"streams": []})
+    assert read_cached_catalog(path, "abc") == {"streams": []}
+    assert read_cached_catalog(path, "def") is None
+
+
+def test_shard_coordinator_splits_date_ranges():
+    """Timeseries shards cover whole date windows of about `shard_days` days."""
+    tap = TapDashHudson(
+        config={
+            "api_key": "test",
+            "brand_ids": [1, 2],
+            "start_date": "2022-01-01",
+            "end_date": "2022-01-10",
+            "window_days": 3,
+        },
+        parse_env_config=False,
+    )
+    shards = ShardCoordinator(tap, processes=2, shard_days=6).get_shards()
+    ranges = [
+        (shard.start_date.day, shard.end_date.day)
+        for shard in shards
+        if shard.stream == "twitter_metrics" and shard.brand_id == 1
+    ]
+    assert ranges == [(1, 6), (7, 10)]
+    assert [
+        shard.start_date for shard in shards if shard.stream == "twitter_account"
+    ] == [
+        None,
+        None,
+    ]
+
+
+def test_selected_metrics_are_requested_and_kept(capsys):
+    """Only the metrics selected in the catalog are requested and emitted."""
+    config = {
+        "api_key": "test",
+        "brand_id": 1,
+        "start_date": "2022-01-01",
+        "end_date": "2022-01-03",
+    }
+    catalog = TapDashHudson(config=config, parse_env_config=False).catalog_dict
+    selected = {"brand_id", "date", "impressions", "likes"}
+    for stream in catalog["streams"]:
+        for entry in stream["metadata"]:
+            if not entry["breadcrumb"]:
+                stream_name = stream["tap_stream_id"]
+                entry["metadata"]["selected"] = stream_name == "twitter_metrics"
+            elif entry["breadcrumb"][-1] not in selected:
+                entry["metadata"]["selected"] = False
+
+    with MockDashHudsonServer() as server:
+        tap = TapDashHudson(
+            config={**config, "api_url": server.api_url},
+            catalog=catalog,
+            parse_env_config=False,
+        )
+        stream = tap.streams["twitter_metrics"]
+        window = (datetime.date(2022, 1, 1), datetime.date(2022, 1, 3))
+        request = stream.prepare_request({"brand_id": 1}, next_page_token=window)
+        assert "metrics=impressions%2Clikes" in request.url
+        # Metrics the API sends anyway are pruned before rows are built.
+        assert stream.select_fields({"impressions": 1, "likes": 2, "replies": 3}) == {
+            "impressions": 1,
+            "likes": 2,
+        }
+        tap._reset_state_progress_markers()
+        stream.sync()
+
+    records = [
+        json.loads(line)["record"]
+        for line in capsys.readouterr().out.splitlines()
+        if '"RECORD"' in line
+    ]
+    assert len(records) == 3
+    assert all(set(record) == selected for record in records)
+
+
+def test_token_bucket_only_limits_when_configured():
+    """Requests wait only for a configured rate or a server's `Retry-After`."""
+    unlimited = TokenBucket()
+    assert sum(unlimited.acquire() for _ in range(100)) == 0
+
+    throttled = requests.Response()
+    throttled.status_code = 429
+    throttled.headers["Retry-After"] = "0.1"
+    unlimited.update(throttled)
+    assert unlimited.rate is None
+    assert unlimited.acquire() > 0
+
+    limited = TokenBucket(max_rate=20)
+    limited.update(throttled)
+    assert limited.rate == 10
+    assert sum(limited.acquire() for _ in range(3)) > 0
+
+
+def test_throttled_requests_are_retried(capsys):
+    """Requests answered with a 429 are retried through the sync path."""
+    with MockDashHudsonServer(throttle_every=2) as server:
+        tap = TapDashHudson(
+            config={
+                "api_key": "test",
+                "api_url": server.api_url,
+                "brand_ids": [1, 2, 3],
+                "requests_per_second": 1000,
+            },
+            parse_env_config=False,
+        )
+        tap._reset_state_progress_markers()
+        tap.streams["twitter_account"].sync()
+
+    assert server.throttled_count > 0
+    counters = tap.metrics.get_counters(stream="twitter_account")
+    assert counters["http_retries_total"] == server.throttled_count
+    records = [
+        line for line in capsys.readouterr().out.splitlines() if '"RECORD"' in line
+    ]
+    assert len(records) == 3
+
+
+def test_interrupted_page_sync_resumes_exactly_once(capsys):
+    """A sync failing on a page resumes from its STATE without gaps or repeats."""
+    config = {"api_key": "test", "brand_id": 1}
+
+    def sync(server: MockDashHudsonServer, state: Optional[dict]) -> List[dict]:
+        tap = TapDashHudson(
+            config={**config, "api_url": server.api_url},
+            state=state,
+            parse_env_config=False,
+        )
+        tap._reset_state_progress_markers()
+        tap.streams["instagram_relationships"].sync()
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    with MockDashHudsonServer(page_size=10, relationships=50, fail_request=3) as server:
+        with pytest.raises(FatalAPIError):
+            sync(server, None)
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    first_ids = [m["record"]["id"] for m in messages if m["type"] == "RECORD"]
+    state = [m["value"] for m in messages if m["type"] == "STATE"][-1]
+    assert first_ids == list(range(20))
+
+    with MockDashHudsonServer(page_size=10, relationships=50) as server:
+        messages = sync(server, state)
+        assert server.request_count == 3
+    second_ids = [m["record"]["id"] for m in messages if m["type"] == "RECORD"]
+    assert first_ids + second_ids == list(range(50))
+
+
+def test_brand_prefetch_stops_at_memory_budget():
+    """Brands fetched ahead pause once their records fill their budget."""
+    with MockDashHudsonServer(page_size=10, relationships=50) as server:
+        tap = TapDashHudson(
+            config={
+                "api_key": "test",
+                "api_url": server.api_url,
+                "brand_ids": [1, 2, 3],
+                "brand_concurrency": 3,
+                "prefetch_buffer_mb": 0,
+            },
+            parse_env_config=False,
+        )
+        records = tap.streams["instagram_relationships"].get_records({"brand_id": 1})
+        assert next(records)["id"] == 0
+        time.sleep(0.2)
+        # Each brand has at most its current page and one prefetched, of five.
+        assert server.request_count <= 9
+        records.close()
+
+
+def test_async_engine_streams_pages_and_closes():
+    """The async engine fetches a unit's pages as they are read, and is closed."""
+    with MockDashHudsonServer(page_size=10, relationships=50) as server:
+        tap = TapDashHudson(
+            config={
+                "api_key": "test",
+                "api_url": server.api_url,
+                "brand_id": 1,
+                "request_engine": "async",
+            },
+            parse_env_config=False,
+        )
+        records = tap.streams["instagram_relationships"].get_records({"brand_id": 1})
+        assert next(records)["id"] == 0
+        time.sleep(0.2)
+        # The page being read, one waiting and one being put, of five.
+        assert server.request_count <= 3
+        assert len(list(records)) == 49
+        engine = tap.async_engine
+        tap.close_connections()
+
+    assert not engine.loop.is_running()
+    assert tap._async_engine is None
+
+
+def test_each_page_is_decoded_once(monkeypatch, capsys):
+    """Records and the next page token are read from one decode of each page."""
+    decoded = []
+    monkeypatch.setattr(client, "orjson", None)
+    response_json = requests.Response.json
+
+    def counting_json(response: requests.Response, **kwargs: Any) -> Any:
+        decoded.append(response.url)
+        return response_json(response, **kwargs)
+
+    monkeypatch.setattr(requests.Response, "json", counting_json)
+    with MockDashHudsonServer(page_size=10, relationships=30) as server:
+        tap = TapDashHudson(
+            config={"api_key": "test", "api_url": server.api_url, "brand_id": 1},
+            parse_env_config=False,
+        )
+        tap._reset_state_progress_markers()
+        tap.streams["instagram_relationships"].sync()
+        assert server.request_count == 3
+
+    assert len(decoded) == len(set(decoded)) == 3
+    records = [
+        line for line in capsys.readouterr().out.splitlines() if '"RECORD"' in line
+    ]
+    assert len(records) == 30
+
+
+def test_streamed_responses_match_decoded_responses(monkeypatch, capsys):
+    """Incremental parsing yields the same pages of records without a full decode."""
+
+    def sync(stream_responses: bool) -> List[str]:
+        with MockDashHudsonServer(page_size=10, relationships=25) as server:
+            tap = TapDashHudson(
+                config={
+                    "api_key": "test",
+                    "api_url": server.api_url,
+                    "brand_id": 1,
+                    "stream_responses": stream_responses,
+                },
+                parse_env_config=False,
+            )
+            tap._reset_state_progress_markers()
+            tap.streams["instagram_relationships"].sync()
+        return [
+            json.dumps(json.loads(line)["record"])
+            for line in capsys.readouterr().out.splitlines()
+            if '"RECORD"' in line
+        ]
+
+    decoded = sync(False)
+
+    def fail_decode(self: Any, response: requests.Response) -> Any:
+        raise AssertionError("Streamed responses must not be decoded whole.")
+
+    monkeypatch.setattr(client.DashHudsonStream, "response_json", fail_decode)
+    assert sync(True) == decoded
+    assert len(decoded) == 25
+
+
+def test_streams_share_keep_alive_sessions_per_host():
+    """Streams and brands calling one host reuse its pooled connections."""
+
+    def sync(keep_alive: bool) -> MockDashHudsonServer:
+        with MockDashHudsonServer() as server:
+            tap = TapDashHudson(
+                config={
+                    "api_key": "test",
+                    "api_url": server.api_url,
+                    "brand_ids": [1, 2, 3],
+                    "brand_concurrency": 1,
+                    "start_date": "2022-01-01",
+                    "end_date": "2022-01-03",
+                    "http_keep_alive": keep_alive,
+                },
+                parse_env_config=False,
+            )
+            tap._reset_state_progress_markers()
+            for name in ("twitter_account", "twitter_metrics"):
+                tap.streams[name].sync()
+            assert tap.streams["twitter_account"].requests_session is tap.get_session(
+                tap.streams["twitter_metrics"].url_base
+            )
+        return server
+
+    pooled = sync(True)
+    assert pooled.request_count == 6
+    assert pooled.connection_count == 1
+    assert sync(False).connection_count == 6
+
+
+def test_interrupted_windows_resume_from_synced_ranges(capsys):
+    """Completed date windows are checkpointed, so a re-run only requests the rest."""
+
+    def sync(server: MockDashHudsonServer, state: Optional[dict]) -> None:
+        tap = TapDashHudson(
+            config={
+                "api_key": "test",
+                "api_url": server.api_url,
+                "brand_id": 1,
+                "start_date": "2022-01-01",
+                "end_date": "2022-01-08",
+                "window_days": 2,
+                "date_concurrency": 1,
+                # Without re-requesting restated days, every date is emitted once.
+                "restatement_lookback_days": 0,
+            },
+            state=state,
+            parse_env_config=False,
+        )
+        tap._reset_state_progress_markers()
+        tap.streams["twitter_metrics"].sync()
+
+    with MockDashHudsonServer(fail_request=3) as server:
+        with pytest.raises(FatalAPIError):
+            sync(server, None)
+    messages = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    state = [m["value"] for m in messages if m["type"] == "STATE"][-1]
+    partition = state["bookmarks"]["twitter_metrics"]["partitions"][0]
+    assert partition["synced_ranges"] == [["2022-01-01", "2022-01-04"]]
+
+    with MockDashHudsonServer() as server:
+        sync(server, state)
+        assert server.request_count == 2
+    messages += [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    dates = [m["record"]["date"][:10] for m in messages if m["type"] == "RECORD"]
+    assert dates == [f"2022-01-0{day}" for day in range(1, 9)]
+
+
+def test_demographics_days_fan_out_in_date_order(capsys):
+    """Concurrent day requests emit days in order, each before its bookmark."""
+
+    def sync(date_concurrency: int) -> List[dict]:
+        with MockDashHudsonServer(latency=0.01) as server:
+            tap = TapDashHudson(
+                config={
+                    "api_key": "test",
+                    "api_url": server.api_url,
+                    "brand_id": 1,
+                    "start_date": "2022-01-01",
+                    "end_date": "2022-01-08",
+                    "date_concurrency": date_concurrency,
+                },
+                parse_env_config=False,
+            )
+            tap._reset_state_progress_markers()
+            tap.streams["instagram_daily_followers_demographics"].sync()
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    serial = sync(1)
+    messages = sync(4)
+    records = [message["record"] for message in messages if message["type"] == "RECORD"]
+    assert records == [m["record"] for m in serial if m["type"] == "RECORD"]
+    assert len({record["date"] for record in records}) == 8
+
+    last_date = ""
+    for message in messages:
+        if message["type"] == "RECORD":
+            last_date = message["record"]["date"]
+        elif message["type"] == "STATE":
+            stream_state = message["value"]["bookmarks"][
+                "instagram_daily_followers_demographics"
+            ]
+            bookmark = stream_state["partitions"][0].get("replication_key_value", "")
+            assert bookmark[:10] <= last_date[:10]
+
+
+def _sync_all(config: dict, capsys) -> Tuple[Dict[str, List[dict]], dict]:
+    """Sync every stream against a mock server, returning records and final STATE."""
+    with MockDashHudsonServer(page_size=10, relationships=30) as server:
+        tap = TapDashHudson(
+            config={
+                "api_key": "test",
+                "api_url": server.api_url,
+                "brand_ids": [1, 2],
+                "start_date": "2022-01-01",
+                "end_date": "2022-01-06",
+                **config,
+            },
+            parse_env_config=False,
+        )
+        tap.sync_all()
+    records: Dict[str, List[dict]] = {}
+    states = []
+    for line in capsys.readouterr().out.splitlines():
+        message = json.loads(line)
+        if message["type"] == "RECORD":
+            records.setdefault(message["stream"], []).append(message["record"])
+        elif message["type"] == "STATE":
+            states.append(message["value"])
+    return records, states[-1]
+
+
+def test_concurrent_streams_match_serial_sync(capsys):
+    """Concurrent streams emit each stream's records and the final STATE unchanged."""
+    serial_records, serial_state = _sync_all({}, capsys)
+    records, state = _sync_all({"concurrent_streams": True}, capsys)
+    assert len(serial_records) == len(STREAM_CLASSES)
+    assert records == serial_records
+    assert state == serial_state
+
+
+def test_benchmark_syncs_every_stream():
+    """Every stream syncs records end to end against the mock server."""
+    results = run_benchmark(days=3, relationships=25, page_size=10, throttle_every=7)
+    assert results
+    for result in results:
+        assert result["records"] > 0, result["stream"]
+
+
 # TODO: Create additional tests as appropriate for your tap.
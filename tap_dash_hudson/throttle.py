@@ -0,0 +1,117 @@
+"""Rate limiting of requests against the Dash Hudson backends."""
+
+import email.utils
+import random
+import threading
+import time
+from typing import Optional
+
+import requests
+
+MIN_REQUESTS_PER_SECOND = 0.1
+
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Return the seconds to wait from a `Retry-After` header, if any."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def get_retry_wait(response: Optional[requests.Response], attempt: int) -> float:
+    """Return how long to wait before retry number `attempt`.
+
+    The server's `Retry-After` is honoured when sent, otherwise the wait is a
+    full-jitter exponential backoff.
+    """
+    if response is not None:
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return retry_after
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+    return random.uniform(0, ceiling)
+
+
+class TokenBucket:
+    """Adaptive token bucket shared by every stream calling one backend host.
+
+    Without a `max_rate` requests are not limited, except that the
+    `Retry-After` and `X-RateLimit-*` headers pause the bucket until the server
+    is ready for more requests. With one, the request rate starts at
+    `max_rate`, halves whenever the server throttles a request and creeps back
+    up with each successful response.
+    """
+
+    def __init__(self, max_rate: Optional[float] = None) -> None:
+        """Initialize the bucket."""
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self.capacity = max(max_rate or 0.0, 1.0)
+        self.tokens = self.capacity
+        self.total_wait = 0.0
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        if self.rate is None:
+            self.tokens = self.capacity
+        else:
+            elapsed = now - self._updated
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Block until a request may be sent, returning the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._paused_until - now
+                if delay <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    self.total_wait += waited
+                    return waited
+                if delay <= 0 and self.rate is not None:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for the next `seconds`."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def update(self, response: requests.Response) -> None:
+        """Adapt the request rate to the server's feedback on `response`."""
+        if response.status_code == 429:
+            with self._lock:
+                if self.rate is not None:
+                    self.rate = max(self.rate / 2, MIN_REQUESTS_PER_SECOND)
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after:
+                self.pause(retry_after)
+            return
+
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = parse_retry_after(response.headers.get("X-RateLimit-Reset"))
+        if remaining is not None and reset and remaining.strip() == "0":
+            # Reset may be an epoch timestamp or a number of seconds.
+            self.pause(reset - time.time() if reset > time.time() else reset)
+
+        if response.status_code < 400 and self.max_rate is not None:
+            with self._lock:
+                rate = self.rate or self.max_rate
+                self.rate = min(rate + self.max_rate / 20, self.max_rate)
@@ -0,0 +1,55 @@
+"""Reshaping of wide metric payloads into long metric rows."""
+
+from itertools import repeat
+from typing import Any, Dict, Iterator, List, Mapping, Sequence
+
+Columns = Dict[str, List[Any]]
+
+METRIC_COLUMNS = ("date", "metric_name", "metric_value")
+
+
+def _empty_columns() -> Columns:
+    return {name: [] for name in METRIC_COLUMNS}
+
+
+def unpivot_series(payload: Mapping[str, Mapping[str, Sequence[Any]]]) -> Columns:
+    """Unpivot `{metric: {"labels": [...], "values": [...]}}` into metric columns.
+
+    Each metric's series is appended to the columns whole, with one Python
+    step per metric rather than per cell.
+    """
+    columns = _empty_columns()
+    dates, names, values = columns.values()
+    for metric_name, series in payload.items():
+        labels, metric_values = series["labels"], series["values"]
+        if len(labels) != len(metric_values):
+            # Keep zip semantics: unmatched labels or values are dropped.
+            size = min(len(labels), len(metric_values))
+            labels, metric_values = labels[:size], metric_values[:size]
+        dates.extend(labels)
+        names.extend(repeat(metric_name, len(labels)))
+        values.extend(metric_values)
+    return columns
+
+
+def unpivot_mapping(payload: Mapping[str, Mapping[str, Any]]) -> Columns:
+    """Unpivot `{date: {metric: value}}` into metric columns."""
+    columns = _empty_columns()
+    dates, names, values = columns.values()
+    for date, metrics in payload.items():
+        dates.extend(repeat(date, len(metrics)))
+        names.extend(metrics.keys())
+        values.extend(metrics.values())
+    return columns
+
+
+def iter_metric_rows(columns: Columns) -> Iterator[dict]:
+    """Yield one record per cell of the metric columns.
+
+    Singer RECORD messages are written one dict at a time, so this is where
+    every cell becomes a Python object.
+    """
+    for date, metric_name, metric_value in zip(
+        columns["date"], columns["metric_name"], columns["metric_value"]
+    ):
+        yield {"date": date, "metric_name": metric_name, "metric_value": metric_value}
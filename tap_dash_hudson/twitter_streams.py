@@ -1,23 +1,30 @@
-"""Stream type classes for tap-dash-hudson
-from the Twitter backend, docs https://twitter.dashhudson.com/docs."""
-import datetime
-from typing import Any, Dict, Optional, Iterable
+"""Stream type classes for tap-dash-hudson from the Twitter backend.
+
+Docs: https://twitter.dashhudson.com/docs.
+"""
+
+from typing import Iterable
 
 import requests
 from singer_sdk import typing as th  # JSON Schema typing helpers
 
-from tap_dash_hudson.client import DashHudsonStream
+from tap_dash_hudson.client import DashHudsonStream, DashHudsonTimeseriesStream
 
 
 class TwitterBackendStream(DashHudsonStream):
-    service = 'twitter'
+    """Base class for streams of the Twitter backend."""
+
+    service = "twitter"
 
 
 class TwitterAccountStream(TwitterBackendStream):
+    """Twitter account of a brand."""
+
     name = "twitter_account"
     path = "/brands/{brand_id}/account"
     primary_keys = ["id"]
-    replication_key = None
+    replication_key = None  # type: ignore[override]
+    cacheable = True
     schema = th.PropertiesList(
         th.Property("id", th.NumberType),
         th.Property("ads_account_id", th.NumberType),
@@ -31,11 +38,14 @@ class TwitterAccountStream(TwitterBackendStream):
     ).to_dict()
 
 
-class TwitterMetricsStream(TwitterBackendStream):
+class TwitterMetricsStream(TwitterBackendStream, DashHudsonTimeseriesStream):
+    """Daily Twitter metrics of a brand."""
+
     name = "twitter_metrics"
     path = "/brands/{brand_id}/metrics"
     primary_keys = ["brand_id", "date"]
     replication_key = "date"
+    metrics_param = "metrics"
     schema = th.PropertiesList(
         th.Property("brand_id", th.NumberType),
         th.Property("date", th.DateTimeType),
@@ -82,18 +92,8 @@ class TwitterMetricsStream(TwitterBackendStream):
         th.Property("video_views_total", th.NumberType),
     ).to_dict()
 
-    def get_url_params(
-        self, context: Optional[dict], next_page_token: Optional[Any]
-    ) -> Dict[str, Any]:
-        start_date = self.get_starting_timestamp(context)
-        params: dict = {
-            "scale": "DAILY",
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": self.config.get("end_date", (datetime.date.today() - datetime.timedelta(days=1)).strftime("%Y-%m-%d")),
-        }
-        return params
-
     def parse_response(self, response: requests.Response) -> Iterable[dict]:
-        rows = response.json()['timeseries_metrics']
+        """Yield one row per day with its selected metrics."""
+        rows = self.response_json(response)["timeseries_metrics"]
         for row in rows:
-            yield dict(**{"date": row['timestamp']}, **row['metrics'])
+            yield {"date": row["timestamp"], **self.select_fields(row["metrics"])}
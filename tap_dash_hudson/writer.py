@@ -0,0 +1,250 @@
+"""Singer message writer shared by every stream of a tap run."""
+
+import datetime
+import gzip
+import io
+import json
+import re
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple, cast
+
+import singer
+import singer.utils
+
+OUTPUT_COMPRESSIONS = ("gzip", "zstd")
+MESSAGE_ENCODERS = ("json", "orjson")
+DEFAULT_BUFFER_KB = 1024
+DEFAULT_FLUSH_SECONDS = 1.0
+
+# Both encoders write the message type first, with or without spaces.
+_MESSAGE_TYPE = re.compile(r'\{\s*"type"\s*:\s*"([A-Z_]+)"')
+
+
+def get_message_type(line: str) -> Optional[str]:
+    """Return the type of a serialized Singer message, such as "RECORD"."""
+    match = _MESSAGE_TYPE.match(line)
+    if match is not None:
+        return match.group(1)
+    try:
+        message = json.loads(line)
+    except ValueError:
+        return None
+    return message.get("type") if isinstance(message, dict) else None
+
+
+def open_output(
+    path: Optional[str] = None, compression: Optional[str] = None
+) -> TextIO:
+    """Return a text stream writing to `path`, or STDOUT, optionally compressed.
+
+    A named pipe works as `path`, so compressed output can be piped across hosts.
+    Closing the stream ends the compressed data but leaves STDOUT open.
+    """
+    if compression == "gzip":
+        if path:
+            return cast(
+                TextIO, gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+            )
+        binary: Any = gzip.GzipFile(
+            fileobj=sys.stdout.buffer, mode="wb", compresslevel=6
+        )
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd output requires the `zstandard` package.") from None
+        binary = zstandard.ZstdCompressor().stream_writer(
+            open(path, "wb") if path else sys.stdout.buffer, closefd=bool(path)
+        )
+    elif compression is not None:
+        raise ValueError(f"Unknown output compression '{compression}'.")
+    elif path:
+        return open(path, "w", encoding="utf-8")
+    else:
+        raise ValueError("An output path or compression is required.")
+    return io.TextIOWrapper(binary, encoding="utf-8")
+
+
+class MessageWriter:
+    """Serialize Singer messages onto STDOUT, or the output set by `set_output`.
+
+    Streams may sync on different threads, so every message is written under a
+    single lock. The lock is re-entrant so streams can also hold it while they
+    mutate the shared tap state, keeping STATE messages consistent.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the writer."""
+        self.lock = threading.RLock()
+        self.output: Optional[TextIO] = None
+
+    def set_output(self, output: TextIO) -> None:
+        """Write messages to `output`, such as a compressed stream from `open_output`.
+
+        It is only flushed at each STATE message, so compressors see whole
+        batches of records rather than one line at a time.
+        """
+        self.output = output
+
+    def write_message(self, message: singer.Message) -> None:
+        """Write one message as a complete line."""
+        self._write(
+            singer.format_message(message) + "\n",
+            isinstance(message, singer.StateMessage),
+        )
+
+    def write_state(self, state: dict) -> None:
+        """Write a STATE message of the whole tap state."""
+        self.write_message(singer.StateMessage(value=state))
+
+    def write_line(self, line: str) -> None:
+        """Write an already serialized message, such as one relayed from a worker."""
+        self._write(
+            line if line.endswith("\n") else line + "\n",
+            get_message_type(line) == "STATE",
+        )
+
+    def flush(self) -> None:
+        """Flush everything written so far."""
+        with self.lock:
+            (self.output or sys.stdout).flush()
+
+    def close(self) -> None:
+        """Flush and close the output set by `set_output`, ending any zstd frame."""
+        with self.lock:
+            self.flush()
+            if self.output is not None:
+                self.output.close()
+                self.output = None
+
+    def _write(self, text: str, is_state: bool) -> None:
+        with self.lock:
+            output = self.output or sys.stdout
+            output.write(text)
+            if self.output is None or is_state:
+                output.flush()
+
+
+class BufferedMessageWriter(MessageWriter):
+    """Message writer buffering messages and serializing records through envelopes.
+
+    Messages are written in chunks of about `buffer_size` characters, or once
+    `flush_seconds` have passed since the last flush, and always at STATE
+    messages so targets never see a STATE before the records it covers. A
+    background thread applies `flush_seconds` while no messages arrive, such
+    as during a long request.
+
+    RECORD messages are serialized by joining a stream's cached envelope with
+    the encoded record. The `json` encoder writes exactly what singer-python
+    does. `orjson` is faster, but its compact lines only match in content.
+    Records an encoder cannot handle, such as decimals, fall back to
+    singer-python.
+    """
+
+    def __init__(
+        self,
+        buffer_size: int = DEFAULT_BUFFER_KB * 1024,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        encoder: str = "json",
+    ) -> None:
+        """Initialize the writer."""
+        super().__init__()
+        self.buffer_size = buffer_size
+        self.flush_seconds = flush_seconds
+        self._encode, self._separators = _get_encoder(encoder)
+        self._envelopes: Dict[str, str] = {}
+        self._buffer: List[str] = []
+        self._buffered = 0
+        self._flushed_at = time.monotonic()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    def write_message(self, message: singer.Message) -> None:
+        """Buffer one message as a complete line."""
+        if isinstance(message, singer.RecordMessage):
+            self._write(self._format_record(message), False)
+        else:
+            super().write_message(message)
+
+    def flush(self) -> None:
+        """Write out the buffered messages."""
+        with self.lock:
+            output = self.output or sys.stdout
+            output.write("".join(self._buffer))
+            output.flush()
+            self._buffer.clear()
+            self._buffered = 0
+            self._flushed_at = time.monotonic()
+
+    def close(self) -> None:
+        """Stop the background flushes, then flush and close the output."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self._closed = threading.Event()
+        super().close()
+
+    def _write(self, text: str, is_state: bool) -> None:
+        with self.lock:
+            if self._flusher is None and self.flush_seconds > 0:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically, args=(self._closed,), daemon=True
+                )
+                self._flusher.start()
+            self._buffer.append(text)
+            self._buffered += len(text)
+            if (
+                is_state
+                or self._buffered >= self.buffer_size
+                or time.monotonic() - self._flushed_at >= self.flush_seconds
+            ):
+                self.flush()
+
+    def _flush_periodically(self, closed: threading.Event) -> None:
+        # Buffered messages go out even when no message arrives to check the age.
+        while not closed.wait(self.flush_seconds / 2):
+            with self.lock:
+                stale = time.monotonic() - self._flushed_at >= self.flush_seconds
+                if self._buffer and stale:
+                    self.flush()
+
+    def _format_record(self, message: singer.RecordMessage) -> str:
+        if message.version is not None:
+            return singer.format_message(message) + "\n"
+        try:
+            record = self._encode(message.record)
+        except (TypeError, ValueError, OverflowError):
+            return singer.format_message(message) + "\n"
+        envelope = self._envelopes.get(message.stream)
+        if envelope is None:
+            item, key = self._separators
+            envelope = self._envelopes[message.stream] = (
+                f'{{"type"{key}"RECORD"{item}"stream"{key}'
+                f'{self._encode(message.stream)}{item}"record"{key}'
+            )
+        if not message.time_extracted:
+            return f"{envelope}{record}}}\n"
+        time_extracted = singer.utils.strftime(
+            message.time_extracted.astimezone(datetime.timezone.utc)
+        )
+        item, key = self._separators
+        return f'{envelope}{record}{item}"time_extracted"{key}"{time_extracted}"}}\n'
+
+
+def _get_encoder(encoder: str) -> Tuple[Callable[[Any], str], Tuple[str, str]]:
+    # The encoder and its (item, key) separators.
+    if encoder == "json":
+        # singer-python's settings, with the standard library's C encoder.
+        return json.JSONEncoder(ensure_ascii=True, allow_nan=False).encode, (", ", ": ")
+    if encoder == "orjson":
+        try:
+            import orjson
+        except ImportError:
+            raise ImportError(
+                "The orjson encoder requires the `speedups` extra (orjson)."
+            ) from None
+        return lambda value: orjson.dumps(value).decode(), (",", ":")
+    raise ValueError(f"Unknown message encoder '{encoder}'.")